@@ -1,39 +1,90 @@
 import numpy as np
-import random as random
 
 class Agents:
     """
     Represents the collection of agents in the simulation.
     """
 
-    def __init__(self, env, num_people, num_fires):
+    def __init__(self, env, num_people, num_fires, rng=None, spawn_density=None):
         """
         Initializes the Agents object with the specified environment, number of people, and number of fires.
 
+        People and fires are placed on distinct cells that hold no obstacle, exit,
+        person or fire, so the environment should hold its layout already.
+
         Args:
             env (Environment): The environment in which the agents operate.
             num_people (int): The number of people in the simulation.
             num_fires (int): The number of fires in the simulation.
+            rng (np.random.Generator): The random generator of the simulation, the environment's when None.
+            spawn_density (np.ndarray): A (height, width) array of relative weights for placing
+                people (see zone_density), uniform over the free cells when None.
         """
         self.environment = env
+        self.rng = env.rng if rng is None else rng
         self.persons = []
         self.fires = []
         self.obstacles = []
         self.exits = []
-        self.panic_levels = []
+        self.panic_levels = env.telemetry.series("panic_levels", int)
         self.dead = 0
 
-        # Generate random positions for people
-        for _ in range(num_people):
-            person = self.Person(random.randint(0, env.width - 1), random.randint(0, env.height - 1), self.environment)
-            self.persons.append(person)
-            self.environment.add_person(person)
-
-        # Generate random positions for fires
-        for _ in range(num_fires):
-            fire = self.Fire(random.randint(0, env.width - 1), random.randint(0, env.height - 1), self.environment)
-            self.fires.append(fire)
-            self.environment.add_fire(fire)
+        # Generate random positions for people on distinct free cells
+        free = env.free_cells()
+        cells = self._sample_cells(free, num_people, spawn_density)
+        self.persons = [self.Person(x, y, self.environment) for x, y in cells.tolist()]
+        self.environment.add_persons(self.persons)
+
+        # Generate random positions for fires on the cells left free
+        free[cells[:, 1], cells[:, 0]] = False
+        cells = self._sample_cells(free, num_fires)
+        self.fires = [self.Fire(x, y, self.environment) for x, y in cells.tolist()]
+        self.environment.add_fires(self.fires)
+
+    def _sample_cells(self, free, count, density=None) -> np.ndarray:
+        """
+        Samples `count` distinct free cells without replacement.
+
+        Args:
+            free (np.ndarray): A (height, width) boolean array of the cells that may be picked.
+            count (int): The number of cells to pick.
+            density (np.ndarray): A (height, width) array of relative weights, uniform when None.
+
+        Returns:
+            np.ndarray: A (count, 2) array of (x, y) positions.
+        """
+        weights = free.ravel() if density is None else np.where(free, density, 0).ravel()
+        candidates = np.flatnonzero(weights > 0)
+        if count > len(candidates):
+            raise ValueError(f"Cannot place {count} agents on {len(candidates)} free cells")
+        if density is None:
+            picks = self.rng.choice(candidates, size=count, replace=False)
+        elif count > 0:
+            # weighted sampling without replacement: keep the cells with the smallest exponential keys
+            keys = self.rng.exponential(size=len(candidates)) / weights[candidates]
+            picks = candidates[np.argpartition(keys, count - 1)[:count]]
+        else:
+            picks = candidates[:0]
+        ys, xs = np.divmod(picks, free.shape[1])
+        return np.column_stack((xs, ys))
+
+    @staticmethod
+    def zone_density(env, zones) -> np.ndarray:
+        """
+        Builds a spawn density map from rectangular spawn zones.
+
+        Args:
+            env (Environment): The environment the map is built for.
+            zones (list): (x0, y0, x1, y1, weight) tuples; corners are inclusive and
+                the weights of overlapping zones add up.
+
+        Returns:
+            np.ndarray: A (height, width) array of relative weights, 0 outside every zone.
+        """
+        density = np.zeros((env.height, env.width))
+        for x0, y0, x1, y1, weight in zones:
+            density[y0:y1 + 1, x0:x1 + 1] += weight
+        return density
             
     def update(self):
         # Update state of each person
@@ -44,9 +95,30 @@ class Agents:
             self.panic_levels.append(person.panic)
 
         # Update state of each fire
+        self.spread_fires()
         for fire in self.fires:
-            fire.fire_spread()
             fire.calculate_effect(self.persons)
+
+    def positions(self, persons=None) -> np.ndarray:
+        """
+        Returns the positions of the persons as an (N, 2) array of (x, y).
+
+        Args:
+            persons (list): The persons to read, all current persons when None.
+        """
+        persons = self.persons if persons is None else persons
+        positions = np.fromiter((c for p in persons for c in (p.xPos, p.yPos)), dtype=float, count=2 * len(persons))
+        return positions.reshape(-1, 2)
+
+    def spread_fires(self):
+        """
+        Spreads every fire, drawing the random numbers of all fires at once.
+        """
+        num_directions = len(Agents.Fire.DIRECTIONS)
+        orders = self.rng.permuted(np.tile(np.arange(num_directions), (len(self.fires), 1)), axis=1)
+        draws = self.rng.random((len(self.fires), num_directions))
+        for fire, order, draw in zip(self.fires, orders, draws):
+            fire.fire_spread(order, draw)
                 
     class Person:
         """
@@ -72,6 +144,9 @@ class Agents:
             self.time_to_escape = None  # None means person has not escaped yet
             self.social_distance = 5
             self.congestion_radius = 10  # consider persons within a distance of 10 as contributing to congestion
+            self.vx = 0.0  # velocity, only used by the social-force movement
+            self.vy = 0.0
+            self.target_exit = None  # the exit chosen at the last full update
             
 
 
@@ -87,7 +162,7 @@ class Agents:
 
         def can_move(self, dx: int, dy: int) -> bool:
             """
-            Checks if the person can move in the specified direction.
+            Checks if the person can move in the specified direction, which must not hold an obstacle or a fire.
 
             Args:
                 dx (int): The change in the x-coordinate.
@@ -97,7 +172,7 @@ class Agents:
                 bool: True if the person can move, False otherwise.
             """
             return self.environment.is_within_bounds(self.xPos + dx, self.yPos + dy) and \
-                   not self.environment.is_obstacle(self.xPos + dx, self.yPos + dy)
+                   not self.environment.is_blocked(self.xPos + dx, self.yPos + dy)
                    
                    
 
@@ -112,7 +187,8 @@ class Agents:
             if self.can_move(dx, dy):
                 self.xPos += dx
                 self.yPos += dy
-            print(f'Person moved to: ({self.xPos}, {self.yPos})')
+            if self.environment.verbose:
+                print(f'Person moved to: ({self.xPos}, {self.yPos})')
 
 
         def move_towards_least_congested_exit(self, consider_others=False):
@@ -135,6 +211,7 @@ class Agents:
                     return
 
             # Move towards the least congested exit
+            self.target_exit = least_congested_exit
             if least_congested_exit is not None:
                 self.move_towards(least_congested_exit)
         
@@ -142,13 +219,23 @@ class Agents:
             return ((self.xPos - other.xPos)**2 + (self.yPos - other.yPos)**2)**0.5
 
         def move_towards(self, position):
-            # Check if position is a Person instance or a tuple
-            if isinstance(position, Agents.Person):
-                dx = position.xPos - self.xPos
-                dy = position.yPos - self.yPos
-            else:
-                dx = position[0] - self.xPos
-                dy = position[1] - self.yPos
+            """
+            Moves the person one cell towards another person or an exit.
+
+            Towards a person the step follows the straight line unless it leads
+            into an obstacle or a fire. Towards an exit
+            the person steps to the neighboring cell with the shortest walk to
+            it, going around obstacles and burning cells, and stays put when no
+            neighboring cell is closer.
+
+            Args:
+                position (Person or tuple): The person or the (x, y) position of the exit to move towards.
+            """
+            if not isinstance(position, Agents.Person):
+                self.step_down(self.environment.distance_field(position))
+                return
+            dx = position.xPos - self.xPos
+            dy = position.yPos - self.yPos
 
             distance = np.sqrt(dx**2 + dy**2)
 
@@ -160,11 +247,25 @@ class Agents:
             new_y = int(self.yPos + dy)
 
             if self.environment.is_within_bounds(new_x, new_y) and \
-                not self.environment.is_obstacle(new_x, new_y):
+                not self.environment.is_blocked(new_x, new_y):
                     self.xPos, self.yPos = new_x, new_y
 
 
 
+        def step_down(self, field):
+            """
+            Steps to the neighboring cell with the lowest value of a distance field, if it is lower than the current one.
+
+            Args:
+                field (np.ndarray): A (height, width) array of distances, inf on blocked cells.
+            """
+            x, y = self.cell()
+            left, top = max(x - 1, 0), max(y - 1, 0)
+            window = field[top:y + 2, left:x + 2]
+            dy, dx = np.unravel_index(np.argmin(window), window.shape)
+            if window[dy, dx] < field[y, x]:
+                self.xPos, self.yPos = left + int(dx), top + int(dy)
+
         def follow_crowd(self, persons):
             """
             Moves the person in the direction of the average movement of nearby persons.
@@ -186,14 +287,16 @@ class Agents:
             Returns:
                 bool: True if the person is dead, False otherwise.
             """
-            if self.health <= 0:
-                self.dead += 1
-                return True
-            else:
-                return False
+            return self.health <= 0
+
+        def cell(self) -> tuple:
+            """
+            Returns the grid cell the person stands in, the nearest one for continuous positions.
+            """
+            return int(round(self.xPos)), int(round(self.yPos))
 
         def is_escaped(self, timestep) -> bool:
-            if (self.xPos, self.yPos) in self.environment.exits and self.time_to_escape is None:
+            if self.cell() in self.environment.exits and self.time_to_escape is None:
                 self.escaped = True
                 self.time_to_escape = timestep
                 return True
@@ -205,6 +308,9 @@ class Agents:
         Represents a fire in the simulation.
         """
 
+        DIRECTIONS = [(dx, dy) for dx in [-1, 0, 1] for dy in [-1, 0, 1]]
+        SPREAD_PROBABILITY = 0.2  # Only a 20% chance for fire to spread to a neighboring cell
+
         def __init__(self, xPos: int, yPos: int, environment):
             """
             Initializes the Fire object with the specified position and environment.
@@ -218,20 +324,27 @@ class Agents:
             self.yPos = yPos
             self.environment = environment
 
-        def fire_spread(self):
+        def fire_spread(self, order=None, draws=None):
             """
             Spreads the fire to neighboring cells in a randomized manner.
+
+            Args:
+                order (np.ndarray): The order in which DIRECTIONS are tried, shuffled when None.
+                draws (np.ndarray): One uniform random number per direction, drawn when None.
             """
-            spread_probability = 0.2  # Only a 20% chance for fire to spread to a neighboring cell
-            directions = [(dx, dy) for dx in [-1, 0, 1] for dy in [-1, 0, 1]]
-            random.shuffle(directions)
-            for dx, dy in directions:
+            rng = self.environment.rng
+            if order is None:
+                order = rng.permutation(len(self.DIRECTIONS))
+            if draws is None:
+                draws = rng.random(len(self.DIRECTIONS))
+            for index, draw in zip(order, draws):
+                dx, dy = self.DIRECTIONS[index]
                 new_x = self.xPos + dx
                 new_y = self.yPos + dy
                 if (self.environment.is_within_bounds(new_x, new_y) and 
                     not self.environment.is_obstacle(new_x, new_y) and 
                     not self.environment.is_fire(new_x, new_y)):
-                    if random.random() < spread_probability:  # Use a random number to decide whether to spread
+                    if draw < self.SPREAD_PROBABILITY:  # Use a random number to decide whether to spread
                         new_fire = Agents.Fire(new_x, new_y, self.environment)
                         self.environment.add_fire(new_fire)
                         return
@@ -0,0 +1,192 @@
+import argparse
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from experiments import METRICS, collect_metrics
+from simulation import Simulation
+
+# Per-step series recorded for every run
+SERIES = ("num_escaped", "num_dead", "bottleneck_areas")
+
+# The experiment families of main(), as a batch spec
+DEFAULT_SPEC = {
+    "seed": 0,
+    "timeStep": 10,
+    "simulations": 10,
+    "defaults": {"env_width": 20, "env_height": 20, "num_people": 10, "num_fires": 3, "num_obstacles": 5,
+                 "exit_positions": [[1, 1], [19, 19]]},
+    "experiments": [
+        {"name": "grid_sizes", "variants": [
+            {"env_width": size, "env_height": size, "exit_positions": [[1, size // 2], [size - 1, size // 2]]}
+            for size in range(10, 35, 5)]},
+        {"name": "baseline", "variants": [{}]},
+        {"name": "exit_variation", "variants": [
+            {"exit_positions": [[1, 1], [19, 19]]}, {"exit_positions": [[1, 10], [10, 19]]},
+            {"exit_positions": [[1, 19], [19, 1]]}, {"exit_positions": [[0, 10], [19, 10]]}]},
+        {"name": "crowd_sizes", "variants": [{"num_people": n} for n in range(10, 35, 5)]},
+    ],
+}
+
+
+def run_batch_simulation(params, timeStep, seed):
+    """
+    Runs a single simulation without any plotting, printing or pausing.
+
+    Args:
+        params (dict): Keyword arguments for the Simulation constructor.
+        timeStep (int): The number of seconds the persons in the room have to escape.
+        seed (int): Seed of the simulation's random generator.
+
+    Returns:
+        dict: The final metrics and the per-step series of the run.
+    """
+    simulation = Simulation(**params, verbose=False, seed=seed)
+    series = {name: [] for name in SERIES}
+    for _ in range(timeStep):
+        if simulation.time_to_clear is None:
+            simulation.step()
+        series["num_escaped"].append(simulation.num_escaped)
+        series["num_dead"].append(simulation.num_dead)
+        series["bottleneck_areas"].append(simulation.bottleneck_areas[-1] if simulation.bottleneck_areas else 0)
+    return {"metrics": collect_metrics(simulation), "series": series}
+
+
+def _variant_label(variant):
+    """
+    Returns a short label describing the parameters a variant overrides.
+    """
+    if not variant:
+        return "defaults"
+    return ", ".join(f"{key}={value}" for key, value in variant.items())
+
+
+def expand_spec(spec):
+    """
+    Lists every simulation run described by an experiment spec.
+
+    Args:
+        spec (dict): The experiment spec (see DEFAULT_SPEC).
+
+    Returns:
+        list: (experiment name, variant index, replica, params, seed) tuples.
+    """
+    runs = []
+    for experiment in spec["experiments"]:
+        simulations = experiment.get("simulations", spec.get("simulations", 10))
+        for index, variant in enumerate(experiment.get("variants", [{}])):
+            params = dict(spec.get("defaults", {}), **experiment.get("params", {}), **variant)
+            params["exit_positions"] = [tuple(exit) for exit in params["exit_positions"]]
+            if "obstacle_positions" in params:
+                params["obstacle_positions"] = [tuple(pos) for pos in params["obstacle_positions"]]
+            for replica in range(simulations):
+                runs.append((experiment["name"], index, replica, params))
+
+    # one reproducible seed per run, derived from the spec's seed
+    seeds = np.random.SeedSequence(spec.get("seed")).generate_state(len(runs)).tolist()
+    return [(*run, seed) for run, seed in zip(runs, seeds)]
+
+
+def summarize(spec, runs, results):
+    """
+    Aggregates the runs of every experiment variant.
+
+    Returns:
+        dict: Maps an experiment name to the list of its variant summaries.
+    """
+    summary = {}
+    for experiment in spec["experiments"]:
+        variants = experiment.get("variants", [{}])
+        summary[experiment["name"]] = []
+        for index, variant in enumerate(variants):
+            outcomes = [result for (name, i, *_), result in zip(runs, results)
+                        if name == experiment["name"] and i == index]
+            summary[experiment["name"]].append({
+                "label": _variant_label(variant),
+                "variant": variant,
+                "simulations": len(outcomes),
+                "metrics": {metric: {"mean": float(np.mean([o["metrics"][metric] for o in outcomes])),
+                                     "std": float(np.std([o["metrics"][metric] for o in outcomes]))}
+                            for metric in METRICS},
+                "series": {series: np.mean([o["series"][series] for o in outcomes], axis=0).tolist()
+                           for series in SERIES},
+            })
+    return summary
+
+
+def write_outputs(output_dir, runs, results, summary, figures=True):
+    """
+    Writes the per-run metrics to runs.csv, the summaries to summary.json and
+    the figures of every experiment to the figures directory.
+
+    Returns:
+        list: The paths of the written files.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = [os.path.join(output_dir, "runs.csv"), os.path.join(output_dir, "summary.json")]
+    with open(paths[0], "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["experiment", "variant", "replica", "seed", "params", *METRICS])
+        for (name, index, replica, params, seed), result in zip(runs, results):
+            writer.writerow([name, index, replica, seed, json.dumps(params),
+                             *(result["metrics"][metric] for metric in METRICS)])
+    with open(paths[1], "w") as file:
+        json.dump(summary, file, indent=2)
+
+    if figures:
+        import matplotlib
+        matplotlib.use("Agg")  # render to files only, no display needed
+        from visualization import save_experiment_figures
+        figure_dir = os.path.join(output_dir, "figures")
+        os.makedirs(figure_dir, exist_ok=True)
+        for name, variants in summary.items():
+            paths += save_experiment_figures(name, variants, figure_dir)
+    return paths
+
+
+def run_batch(spec, output_dir, workers=None, figures=True):
+    """
+    Runs every simulation of an experiment spec unattended and writes the results to files.
+
+    Args:
+        spec (dict): The experiment spec (see DEFAULT_SPEC).
+        output_dir (str): The directory the results are written to.
+        workers (int): The number of worker processes, 1 to run in this process.
+        figures (bool): Whether to write the figures once all simulations are done.
+
+    Returns:
+        list: The paths of the written files.
+    """
+    runs = expand_spec(spec)
+    timeSteps = [spec["timeStep"]] * len(runs)
+    params = [run[3] for run in runs]
+    seeds = [run[4] for run in runs]
+    if workers == 1:
+        results = list(map(run_batch_simulation, params, timeSteps, seeds))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_batch_simulation, params, timeSteps, seeds, chunksize=4))
+    summary = summarize(spec, runs, results)
+    return write_outputs(output_dir, runs, results, summary, figures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run crowd evacuation experiments without interaction.")
+    parser.add_argument("spec", nargs="?", help="JSON experiment spec, the experiments of main.py when omitted")
+    parser.add_argument("--output", default="results", help="directory for the CSV/JSON results and figures")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--no-figures", action="store_true", help="only write the metrics")
+    args = parser.parse_args()
+
+    spec = DEFAULT_SPEC
+    if args.spec is not None:
+        with open(args.spec) as file:
+            spec = json.load(file)
+    for path in run_batch(spec, args.output, args.workers, not args.no_figures):
+        print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
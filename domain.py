@@ -0,0 +1,481 @@
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from environment import _repair_distances
+
+# Widest neighbourhood read by any phase (fire damage reaches distance 5)
+HALO = 4
+
+# (dy, dx) of the 8 neighboring cells a person can step to
+OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+# Cells within the distance at which a fire hurts, with the damage it does (< 3: 1, < 5: 0.5)
+DAMAGE_OFFSETS = [(dy, dx, 1.0 if dy * dy + dx * dx < 9 else 0.5)
+                  for dy in range(-HALO, HALO + 1) for dx in range(-HALO, HALO + 1) if dy * dy + dx * dx < 25]
+
+SPREAD_PROBABILITY = 0.2  # as Agents.Fire.SPREAD_PROBABILITY
+INITIAL_HEALTH = 50
+
+# Per-cell arrays of the model; arrays ending in 0/1 are double buffered by step parity.
+# "source" marks the initial fires, the only ones that spread and hurt, as in Simulation.
+CELL_ARRAYS = {
+    "blocked": np.bool_, "exit": np.bool_, "field": np.float32, "source": np.bool_,
+    "fire0": np.bool_, "fire1": np.bool_,
+    "agent0": np.int32, "agent1": np.int32,
+    "health0": np.float32, "health1": np.float32,
+    "move_dir": np.int8, "winner_dir": np.int8, "spread_dir": np.int8,
+}
+
+_MASK64 = (1 << 64) - 1
+
+
+class SharedArrays:
+    """
+    A set of named numpy arrays living in shared memory blocks.
+    """
+
+    def __init__(self, layout, names=None):
+        """
+        Creates the shared memory blocks, or attaches to existing ones.
+
+        Args:
+            layout (dict): Maps an array name to its (shape, dtype).
+            names (dict): Maps an array name to the name of an existing block to attach to.
+        """
+        self.layout = layout
+        self.blocks = {}
+        self.arrays = {}
+        for key, (shape, dtype) in layout.items():
+            size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+            if names is None:
+                block = shared_memory.SharedMemory(create=True, size=size)
+            else:
+                block = shared_memory.SharedMemory(name=names[key])
+            self.blocks[key] = block
+            self.arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    @property
+    def names(self):
+        return {key: block.name for key, block in self.blocks.items()}
+
+    def close(self, unlink=False):
+        """
+        Detaches from the shared memory blocks, removing them when `unlink` is set.
+        """
+        self.arrays.clear()
+        for block in self.blocks.values():
+            block.close()
+            if unlink:
+                block.unlink()
+        self.blocks.clear()
+
+
+class Tile:
+    """
+    A rectangle of cells owned by one worker, in padded grid coordinates.
+    """
+
+    def __init__(self, index, y0, y1, x0, x1):
+        self.index = index
+        self.y0, self.y1, self.x0, self.x1 = y0, y1, x0, x1
+
+    def window(self, array, dy=0, dx=0):
+        """
+        Returns the view of `array` over the tile, shifted by (dy, dx) cells into the halo.
+        """
+        return array[self.y0 + dy:self.y1 + dy, self.x0 + dx:self.x1 + dx]
+
+
+def split_tiles(height, width, tiles):
+    """
+    Splits the grid into a (rows, columns) arrangement of tiles.
+
+    Args:
+        height (int): The height of the environment grid.
+        width (int): The width of the environment grid.
+        tiles (tuple): The number of tile rows and tile columns.
+
+    Returns:
+        list: The Tile objects, in padded grid coordinates.
+    """
+    rows = np.linspace(0, height, tiles[0] + 1).astype(int) + HALO
+    cols = np.linspace(0, width, tiles[1] + 1).astype(int) + HALO
+    return [Tile(i * tiles[1] + j, rows[i], rows[i + 1], cols[j], cols[j + 1])
+            for i in range(tiles[0]) for j in range(tiles[1])]
+
+
+def _uniform(seed, step, tile, width, stream=0):
+    """
+    Returns a uniform random number for every cell of a tile.
+
+    The numbers are a hash of (seed, step, stream, cell), so they do not depend
+    on how the grid is split into tiles.
+    """
+    ys = np.arange(tile.y0 - HALO, tile.y1 - HALO, dtype=np.uint64)[:, None]
+    xs = np.arange(tile.x0 - HALO, tile.x1 - HALO, dtype=np.uint64)[None, :]
+    z = ys * np.uint64(width) + xs
+    z += np.uint64((seed * 0x9E3779B97F4A7C15 + (step + 1) * 0xD1B54A32D192ED03
+                    + stream * 0x8CB92BA72F3D8DD7) & _MASK64)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    return (z >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+def _plan_moves(arrays, tile, cur, step, seed, width, **_):
+    """
+    Lets every person pick the free neighboring cell that is closest to an exit,
+    and every initial fire pick the cell it spreads to. Reads a halo of 1 cell.
+    """
+    fire, agents = arrays[f"fire{cur}"], arrays[f"agent{cur}"]
+    occupied = tile.window(agents) >= 0
+
+    # staying put wins ties, then the first direction in OFFSETS
+    best = tile.window(arrays["field"]).copy()
+    move = np.full(occupied.shape, -1, dtype=np.int8)
+    for d, (dy, dx) in enumerate(OFFSETS):
+        free = ~tile.window(arrays["blocked"], dy, dx) & ~tile.window(fire, dy, dx) & \
+            (tile.window(agents, dy, dx) < 0)
+        value = np.where(free, tile.window(arrays["field"], dy, dx), np.inf)
+        better = value < best
+        best[better] = value[better]
+        move[better] = d
+    move[~occupied] = -1
+    tile.window(arrays["move_dir"])[...] = move
+
+    # as Fire.fire_spread: the directions are tried in a random order and the first
+    # cell free of obstacles and fire whose draw is below SPREAD_PROBABILITY is picked
+    first = np.full(occupied.shape, np.inf)
+    spread = np.full(occupied.shape, -1, dtype=np.int8)
+    for d, (dy, dx) in enumerate(OFFSETS):
+        free = ~tile.window(arrays["blocked"], dy, dx) & ~tile.window(fire, dy, dx)
+        order = _uniform(seed, step, tile, width, stream=1 + d)
+        ignites = free & (_uniform(seed, step, tile, width, stream=1 + len(OFFSETS) + d) < SPREAD_PROBABILITY) & \
+            (order < first)
+        first[ignites] = order[ignites]
+        spread[ignites] = d
+    spread[~tile.window(arrays["source"])] = -1
+    tile.window(arrays["spread_dir"])[...] = spread
+
+
+def _resolve_moves(arrays, tile, cur, **_):
+    """
+    Picks, for every cell, the person allowed to step onto it: the one with the
+    lowest id among those that chose it. Reads a halo of 1 cell.
+    """
+    agents = arrays[f"agent{cur}"]
+    winner_id = np.full((tile.y1 - tile.y0, tile.x1 - tile.x0), np.iinfo(np.int32).max, dtype=np.int32)
+    winner_dir = np.full(winner_id.shape, -1, dtype=np.int8)
+    for d, (dy, dx) in enumerate(OFFSETS):
+        # a person moving in direction d onto this cell stands at the opposite offset
+        ids = tile.window(agents, -dy, -dx)
+        wins = (tile.window(arrays["move_dir"], -dy, -dx) == d) & (ids < winner_id)
+        winner_id[wins] = ids[wins]
+        winner_dir[wins] = d
+    tile.window(arrays["winner_dir"])[...] = winner_dir
+
+
+def _apply_moves(arrays, tile, cur, counters, **_):
+    """
+    Moves the persons into the next buffers, hands over those arriving from
+    neighboring tiles, removes those reaching an exit and spreads the fire.
+    Reads a halo of 1 cell.
+    """
+    nxt = 1 - cur
+    agents, health = arrays[f"agent{cur}"], arrays[f"health{cur}"]
+    move, winner = tile.window(arrays["move_dir"]), tile.window(arrays["winner_dir"])
+
+    # persons whose move was not granted stay where they are
+    stays = tile.window(agents) >= 0
+    for d, (dy, dx) in enumerate(OFFSETS):
+        stays &= ~((move == d) & (tile.window(arrays["winner_dir"], dy, dx) == d))
+    new_agents = np.where(stays, tile.window(agents), -1)
+    new_health = np.where(stays, tile.window(health), 0)
+
+    # persons arriving from a neighboring cell, possibly owned by another tile
+    for d, (dy, dx) in enumerate(OFFSETS):
+        arrive = winner == d
+        new_agents[arrive] = tile.window(agents, -dy, -dx)[arrive]
+        new_health[arrive] = tile.window(health, -dy, -dx)[arrive]
+
+    escaped = (new_agents >= 0) & tile.window(arrays["exit"])
+    counters["escaped"][tile.index] += int(escaped.sum())
+    new_agents[escaped] = -1
+    tile.window(arrays[f"agent{nxt}"])[...] = new_agents
+    tile.window(arrays[f"health{nxt}"])[...] = new_health
+
+    # a cell catches fire when an initial fire next to it picked it, unless it is an
+    # exit or a person stands on it, which Environment.add_fire refuses as well
+    ignite = np.zeros(new_agents.shape, dtype=bool)
+    for d, (dy, dx) in enumerate(OFFSETS):
+        ignite |= tile.window(arrays["spread_dir"], -dy, -dx) == d
+    ignite &= ~tile.window(arrays["exit"]) & (new_agents < 0)
+    tile.window(arrays[f"fire{nxt}"])[...] = tile.window(arrays[f"fire{cur}"]) | ignite
+
+
+def _apply_fire_damage(arrays, tile, cur, counters, **_):
+    """
+    Lowers the health of persons near an initial fire and removes the dead. Reads a halo of 4 cells.
+    """
+    nxt = 1 - cur
+    fire = arrays["source"]
+    agents, health = tile.window(arrays[f"agent{nxt}"]), tile.window(arrays[f"health{nxt}"])
+    damage = np.zeros(agents.shape, dtype=np.float32)
+    for dy, dx, weight in DAMAGE_OFFSETS:
+        damage += np.float32(weight) * tile.window(fire, dy, dx)
+
+    occupied = agents >= 0
+    health[occupied] -= damage[occupied]
+    dead = occupied & (health <= 0)
+    counters["dead"][tile.index] += int(dead.sum())
+    agents[dead] = -1
+
+
+# The phases of one step; every tile finishes a phase before any tile starts the next
+PHASES = [_plan_moves, _resolve_moves, _apply_moves, _apply_fire_damage]
+
+
+def _step(arrays, counters, tiles, step, seed, width, barrier=None):
+    """
+    Runs every phase of one step over the given tiles.
+    """
+    for phase in PHASES:
+        for tile in tiles:
+            phase(arrays, tile, cur=step % 2, step=step, seed=seed, width=width, counters=counters)
+        if barrier is not None:
+            barrier.wait()
+
+
+def _worker(layout, names, tile, seed, width, phase_barrier, start_barrier, done_barrier):
+    """
+    Steps a single tile in a worker process until told to stop.
+    """
+    arrays = SharedArrays(layout, names)
+    try:
+        while True:
+            start_barrier.wait()
+            first, steps = arrays["control"]
+            if steps < 0:
+                break
+            counters = {"escaped": arrays["escaped"], "dead": arrays["dead"]}
+            for step in range(first, first + steps):
+                _step(arrays, counters, [tile], step, seed, width, phase_barrier)
+            done_barrier.wait()
+    finally:
+        arrays.close()
+
+
+class TiledEvacuationModel:
+    """
+    A local evacuation model of one large grid, stepped with the grid split into tiles owned by worker processes.
+
+    This is a model of its own, not a parallel Simulation. Every person steps to
+    the free neighboring cell closest to an exit, at most one person per cell,
+    the lowest id winning a contested cell, and panic plays no part. Simulation's
+    persons instead share cells, walk to the first exit and, once panicking,
+    scan every other person for a neighbor or a crowd to follow, which no halo
+    can hold. An isolated calm person walks the same path in both models.
+
+    The fire follows the rules of Simulation: every initial fire picks at most
+    one neighboring cell free of obstacles and fire per step, trying the
+    directions in a random order with a 20% chance each, the picked cell catches
+    fire unless it is an exit or a person stands on it, and only the initial
+    fires hurt persons, by 1 within distance 3 and by 0.5 within distance 5. The
+    distance field is repaired around the new fires after every step, as
+    Environment.block does, so persons walk around the spreading fire.
+
+    Every rule reads at most HALO cells around a cell, so tiles read their
+    neighbors' halo rows and columns straight from shared memory between phases,
+    and persons crossing a tile boundary are written into the next buffer by the
+    tile that owns their new cell. Random numbers are hashed from (seed, step,
+    cell), so the result is the same for every tiling, including a single tile
+    stepped in-process.
+    """
+
+    def __init__(self, blocked, field, exits, agent_positions, fire_positions, tiles=(2, 1), seed=0):
+        """
+        Initializes the TiledEvacuationModel object.
+
+        Args:
+            blocked (np.ndarray): A (height, width) boolean array of obstacle cells.
+            field (np.ndarray): A (height, width) array of distances to the nearest exit around the
+                obstacles; it is repaired around the initial fires.
+            exits (list): The (x, y) positions of the exits.
+            agent_positions (list): The (x, y) positions of the persons; later duplicates of a cell are dropped.
+            fire_positions (list): The (x, y) positions of the initial fires, the only ones that spread and hurt.
+            tiles (tuple): The number of tile rows and tile columns, one worker per tile.
+            seed (int): Seed of the fire spread.
+        """
+        self.height, self.width = blocked.shape
+        self.seed = seed
+        self.timestep = 0
+        self.tiles = split_tiles(self.height, self.width, tiles)
+
+        padded = (self.height + 2 * HALO, self.width + 2 * HALO)
+        layout = {key: (padded, dtype) for key, dtype in CELL_ARRAYS.items()}
+        layout.update({"escaped": ((len(self.tiles),), np.int64), "dead": ((len(self.tiles),), np.int64),
+                       "control": ((2,), np.int64)})
+        self.arrays = SharedArrays(layout)
+
+        inner = (slice(HALO, HALO + self.height), slice(HALO, HALO + self.width))
+        for key in CELL_ARRAYS:
+            self.arrays[key].fill(0)
+        for key in ("agent0", "agent1", "move_dir", "winner_dir", "spread_dir"):
+            self.arrays[key].fill(-1)
+        self.arrays["blocked"].fill(True)  # the padding behaves like a wall
+        self.arrays["blocked"][inner] = blocked
+        self.arrays["field"].fill(np.inf)
+        self.arrays["field"][inner] = field
+        for x, y in exits:
+            self.arrays["exit"][y + HALO, x + HALO] = True
+        for x, y in fire_positions:
+            if not self.arrays["exit"][y + HALO, x + HALO]:
+                self.arrays["fire0"][y + HALO, x + HALO] = True
+                self.arrays["source"][y + HALO, x + HALO] = True
+        agents = self.arrays["agent0"]
+        for agent_id, (x, y) in enumerate(agent_positions):
+            if agents[y + HALO, x + HALO] < 0:
+                agents[y + HALO, x + HALO] = agent_id
+                self.arrays["health0"][y + HALO, x + HALO] = INITIAL_HEALTH
+        for key in ("escaped", "dead", "control"):
+            self.arrays[key].fill(0)
+
+        self._inner = inner
+        self._workers = []
+        self._repair_field(self.arrays["fire0"][inner], np.zeros((self.height, self.width), dtype=bool))
+
+    @classmethod
+    def from_environment(cls, environment, tiles=(2, 1), seed=0):
+        """
+        Builds the model from the layout, persons and fires of an environment, such as
+        the initial state of a Simulation.
+
+        Args:
+            environment (Environment): The environment whose layout, persons and fires are copied.
+            tiles (tuple): The number of tile rows and tile columns.
+            seed (int): Seed of the fire spread.
+
+        Returns:
+            TiledEvacuationModel: The tiled model.
+        """
+        blocked = environment.obstacle_mask()
+        field = environment.exit_field()
+        persons = [person.cell() for person in environment.persons]
+        fires = [(fire.xPos, fire.yPos) for fire in environment.fires]
+        return cls(blocked, field, environment.exits, persons, fires, tiles, seed)
+
+    @property
+    def num_escaped(self):
+        return int(self.arrays["escaped"].sum())
+
+    @property
+    def num_dead(self):
+        return int(self.arrays["dead"].sum())
+
+    @property
+    def remaining(self):
+        return int((self.agents >= 0).sum())
+
+    @property
+    def agents(self):
+        """
+        Returns the (height, width) array of person ids, -1 on empty cells.
+        """
+        return self.arrays[f"agent{self.timestep % 2}"][self._inner]
+
+    @property
+    def health(self):
+        """
+        Returns the (height, width) array of the persons' health, meaningless on empty cells.
+        """
+        return self.arrays[f"health{self.timestep % 2}"][self._inner]
+
+    @property
+    def fires(self):
+        """
+        Returns the (height, width) boolean array of burning cells.
+        """
+        return self.arrays[f"fire{self.timestep % 2}"][self._inner]
+
+    def _repair_field(self, fires, burning):
+        """
+        Repairs the distance field around the cells in `fires` that were not `burning` before.
+        """
+        ys, xs = np.nonzero(fires & ~burning)
+        if len(xs):
+            blocked = self.arrays["blocked"][self._inner] | fires
+            _repair_distances(self.arrays["field"][self._inner], blocked, list(zip(xs.tolist(), ys.tolist())))
+
+    def _counters(self):
+        return {"escaped": self.arrays["escaped"], "dead": self.arrays["dead"]}
+
+    def step(self):
+        """
+        Performs a single step with every tile stepped in this process.
+        """
+        burning = self.fires.copy()
+        _step(self.arrays, self._counters(), self.tiles, self.timestep, self.seed, self.width)
+        self.timestep += 1
+        self._repair_field(self.fires, burning)
+
+    def run(self, steps):
+        """
+        Performs `steps` steps with one worker process per tile.
+
+        The workers wait between steps while the distance field is repaired here.
+
+        Args:
+            steps (int): The number of steps to perform.
+        """
+        if len(self.tiles) == 1:
+            for _ in range(steps):
+                self.step()
+            return
+        if not self._workers:
+            self._start_workers()
+        for _ in range(steps):
+            burning = self.fires.copy()
+            self.arrays["control"][:] = (self.timestep, 1)
+            self._start_barrier.wait()
+            self._done_barrier.wait()
+            self.timestep += 1
+            self._repair_field(self.fires, burning)
+
+    def _start_workers(self):
+        """
+        Starts one worker process per tile, attached to the shared arrays.
+        """
+        self._phase_barrier = multiprocessing.Barrier(len(self.tiles))
+        self._start_barrier = multiprocessing.Barrier(len(self.tiles) + 1)
+        self._done_barrier = multiprocessing.Barrier(len(self.tiles) + 1)
+        for tile in self.tiles:
+            worker = multiprocessing.Process(
+                target=_worker,
+                args=(self.arrays.layout, self.arrays.names, tile, self.seed, self.width,
+                      self._phase_barrier, self._start_barrier, self._done_barrier),
+                daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def close(self):
+        """
+        Stops the worker processes and frees the shared memory.
+        """
+        if self._workers:
+            self.arrays["control"][:] = (self.timestep, -1)
+            self._start_barrier.wait()
+            for worker in self._workers:
+                worker.join()
+            self._workers = []
+        self.arrays.close(unlink=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,14 +1,20 @@
+import heapq
+from collections import deque
+
 import numpy as np
-import matplotlib.pyplot as plt
+from gates import Gate
+from telemetry import Telemetry
 
 class Environment:
-    def __init__(self, width: int, height: int):
+    def __init__(self, width: int, height: int, rng=None, telemetry=None):
         """
         Initializes a new instance of the Environment class.
 
         Args:
             width (int): The width of the environment grid.
             height (int): The height of the environment grid.
+            rng (np.random.Generator): The random generator of the simulation, a fresh one when None.
+            telemetry (Telemetry): Creates the bounded series recorded during the simulation.
         """
         self.width = width
         self.height = height
@@ -17,6 +23,13 @@ class Environment:
         self.exits = []
         self.persons = []
         self.fires = []
+        self.verbose = True
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.telemetry = Telemetry() if telemetry is None else telemetry
+        self.blocked = np.zeros((height, width), dtype=bool)  # obstacle and burning cells
+        self.distance_fields = {}  # cached distance field of each exit
+        self._exit_field = None  # cached distance to the nearest exit
+        self.gates = []
 
     def add_obstacle(self, x: int, y: int):
         """
@@ -30,6 +43,7 @@ class Environment:
             self.refresh_grid()  # Refresh the grid after adding a person
             self.obstacles.add((x, y))
             self.grid[y, x] = "Obstacle"
+            self.block([(x, y)])
 
     def add_exit(self, x: int, y: int):
         """
@@ -42,6 +56,39 @@ class Environment:
         if self.grid[y, x] is None:
             self.exits.append((x, y))
             self.grid[y, x] = "Exit"
+            self._exit_field = None
+
+    def add_gate(self, name: str, start, end, band: float = 1.0) -> Gate:
+        """
+        Adds a virtual counting line measuring the flow through a door or corridor.
+
+        Gate names must be unique, since the series of a gate are named after it.
+
+        Args:
+            name (str): The name of the gate.
+            start (tuple): The (x, y) position of the first end of the line.
+            end (tuple): The (x, y) position of the second end of the line.
+            band (float): Persons within this distance of the line count towards its density and speed.
+
+        Returns:
+            Gate: The added gate, which collects the per-step flow, density and speed.
+        """
+        if any(gate.name == name for gate in self.gates):
+            raise ValueError(f"A gate named '{name}' already exists")
+        gate = Gate(name, start, end, band, self.telemetry)
+        self.gates.append(gate)
+        return gate
+
+    def record_gates(self, previous, current):
+        """
+        Records the crossings, density and speed of every gate for one time step.
+
+        Args:
+            previous (np.ndarray): An (N, 2) array of person positions before the step.
+            current (np.ndarray): An (N, 2) array of the same persons' positions after the step.
+        """
+        for gate in self.gates:
+            gate.record(previous, current)
 
     def add_person(self, person):
         """
@@ -50,11 +97,49 @@ class Environment:
         Args:
             person (Person): The Person object to be added.
         """
-        if (int(person.xPos), int(person.yPos)) not in self.exits and self.grid[int(person.yPos), int(person.xPos)] is None:
+        x, y = person.cell()
+        if (x, y) not in self.exits and self.grid[y, x] is None:
             if not person.is_dead() and not person.escaped:  # only add the person if they are not dead and haven't escaped
                 self.persons.append(person)
                 self.refresh_grid()  # Refresh the grid after adding a person
-                self.grid[int(person.yPos), int(person.xPos)] = person  # store actual person object
+                self.grid[y, x] = person  # store actual person object
+
+    def add_persons(self, persons):
+        """
+        Adds many persons at once, writing them into the grid in one array operation.
+
+        Args:
+            persons (list): The Person objects to be added, standing on distinct free cells.
+        """
+        self.persons.extend(persons)
+        self._place(persons)
+
+    def add_fires(self, fires):
+        """
+        Adds many fires at once, writing them into the grid in one array operation.
+
+        Args:
+            fires (list): The Fire objects to be added, burning on distinct free cells.
+        """
+        self.fires.extend(fires)
+        self._place(fires)
+        self.block([(int(fire.xPos), int(fire.yPos)) for fire in fires])
+
+    def _place(self, objects):
+        """
+        Stores the objects in the grid cells at their positions.
+        """
+        cells = np.empty(len(objects), dtype=object)
+        cells[:] = objects
+        xs = np.fromiter((int(obj.xPos) for obj in objects), dtype=int, count=len(objects))
+        ys = np.fromiter((int(obj.yPos) for obj in objects), dtype=int, count=len(objects))
+        self.grid[ys, xs] = cells
+
+    def free_cells(self) -> np.ndarray:
+        """
+        Returns a (height, width) boolean array of the cells holding no obstacle, exit, person or fire.
+        """
+        return np.equal(self.grid, None)
 
     def add_fire(self, fire):
         """
@@ -67,6 +152,7 @@ class Environment:
             self.fires.append(fire)
             self.refresh_grid()  # Refresh the grid after adding a person
             self.grid[fire.yPos, fire.xPos] = fire  # store actual fire object
+            self.block([(fire.xPos, fire.yPos)])
 
     def is_fire(self, x: int, y: int) -> bool:
         """
@@ -94,6 +180,19 @@ class Environment:
         """
         return (x, y) in self.obstacles
 
+    def is_blocked(self, x: int, y: int) -> bool:
+        """
+        Checks if the specified position in the environment is an obstacle or a burning cell.
+
+        Args:
+            x (int): The x-coordinate of the position to check.
+            y (int): The y-coordinate of the position to check.
+
+        Returns:
+            bool: True if the position cannot be entered, False otherwise.
+        """
+        return bool(self.blocked[int(y), int(x)])
+
     def is_within_bounds(self, x: int, y: int) -> bool:
         """
         Checks if the specified position is within the bounds of the environment.
@@ -107,6 +206,98 @@ class Environment:
         """
         return 0 <= x < self.width and 0 <= y < self.height
 
+    def distance_field(self, exit) -> np.ndarray:
+        """
+        Returns the walking distance of every cell to the specified exit.
+
+        Distances are counted in moves to one of the 8 neighboring cells, going
+        around obstacles and burning cells. The field is cached and repaired
+        where cells become blocked (see block).
+
+        Args:
+            exit (tuple): The (x, y) position of the exit.
+
+        Returns:
+            np.ndarray: A (height, width) array of distances, inf where the exit cannot be reached.
+        """
+        exit = (int(exit[0]), int(exit[1]))
+        if exit not in self.distance_fields:
+            self.distance_fields[exit] = self._breadth_first_distances(exit)
+        return self.distance_fields[exit]
+
+    def exit_field(self) -> np.ndarray:
+        """
+        Returns the walking distance of every cell to its nearest exit.
+
+        Returns:
+            np.ndarray: A (height, width) array of distances, inf where no exit can be reached.
+        """
+        if self._exit_field is None:
+            self._exit_field = np.full((self.height, self.width), np.inf)
+            for exit in self.exits:
+                np.minimum(self._exit_field, self.distance_field(exit), out=self._exit_field)
+        return self._exit_field
+
+    def obstacle_mask(self) -> np.ndarray:
+        """
+        Returns a (height, width) boolean array of the obstacle cells.
+        """
+        blocked = np.zeros((self.height, self.width), dtype=bool)
+        if self.obstacles:
+            xs, ys = np.array(list(self.obstacles)).T
+            blocked[ys, xs] = True
+        return blocked
+
+    def block(self, cells):
+        """
+        Makes cells impassable and repairs the cached distance fields around them.
+
+        Only the cells whose shortest path to an exit ran through a newly
+        blocked cell are recomputed, so the cost grows with the size of the
+        affected region rather than with the grid.
+
+        Args:
+            cells (list): The (x, y) positions of the cells that became blocked; cells
+                that are blocked already cost nothing unless a field still crosses them.
+        """
+        cells = list(cells)
+        if not cells:
+            return
+        xs, ys = np.array(cells).T
+        self.blocked[ys, xs] = True
+        affected = [_repair_distances(field, self.blocked, cells) for field in self.distance_fields.values()]
+        if self._exit_field is not None:
+            if not all(exit in self.distance_fields for exit in self.exits):
+                self._exit_field = None
+                return
+            # only the nearest-exit distances of the affected cells can have changed
+            changed = np.concatenate([xs + ys * self.width, *affected])
+            fields = np.stack([self.distance_fields[exit] for exit in self.exits]).reshape(len(self.exits), -1)
+            self._exit_field.ravel()[changed] = fields[:, changed].min(axis=0)
+
+    def _breadth_first_distances(self, source) -> np.ndarray:
+        """
+        Computes the distance field of a single source cell with a breadth-first search.
+        """
+        distances = np.full((self.height, self.width), np.inf)
+        if not self.is_within_bounds(*source) or self.blocked[source[1], source[0]]:
+            return distances
+        blocked = self.blocked
+
+        distances[source[1], source[0]] = 0
+        queue = deque([source])
+        while queue:
+            x, y = queue.popleft()
+            next_distance = distances[y, x] + 1
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    nx, ny = x + dx, y + dy
+                    if 0 <= nx < self.width and 0 <= ny < self.height and \
+                            not blocked[ny, nx] and distances[ny, nx] > next_distance:
+                        distances[ny, nx] = next_distance
+                        queue.append((nx, ny))
+        return distances
+
     def update(self):
         """
         Updates the state of the environment and its objects.
@@ -131,7 +322,8 @@ class Environment:
         for obstacle in self.obstacles:
             self.grid[obstacle[1], obstacle[0]] = "Obstacle"
         for person in self.persons:
-            self.grid[int(person.yPos), int(person.xPos)] = person
+            x, y = person.cell()
+            self.grid[y, x] = person
         for fire in self.fires:
             self.grid[int(fire.yPos), int(fire.xPos)] = fire
 
@@ -142,24 +334,72 @@ class Environment:
         Args:
             agents (Agents): The Agents object containing the agents and objects to be plotted.
         """
-        fig, ax = plt.subplots()
+        from visualization import plot_environment  # matplotlib is only loaded when plotting
+        plot_environment(self, agents)
 
-        for exit in self.exits:
-            ax.scatter(*exit, color='green', label='Exit')
 
-        for obstacle in self.obstacles:
-            ax.scatter(*obstacle, color='black', label='Obstacle')
+def _repair_distances(distances, blocked, cells) -> np.ndarray:
+    """
+    Repairs a distance field in place after `cells` became blocked.
+
+    Blocking cells can only lengthen paths. Cells are first visited in order of
+    their old distance, and those left without a neighbor one step closer to
+    the exit lose their distance, which spreads outwards. The distances of
+    those cells are then recomputed from the intact cells around them
+    with a Dijkstra search restricted to the affected region.
+
+    Args:
+        distances (np.ndarray): A (height, width) distance field, updated in place.
+        blocked (np.ndarray): A (height, width) boolean array of the blocked cells, including `cells`.
+        cells (list): The (x, y) positions of the newly blocked cells.
+
+    Returns:
+        np.ndarray: The flat indices of the cells whose distance changed.
+    """
+    height, width = distances.shape
 
-        for person in agents.persons:
-            ax.scatter(person.xPos, person.yPos, color='blue', label='Person')
+    def neighbors(x, y):
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                nx, ny = x + dx, y + dy
+                if (dx or dy) and 0 <= nx < width and 0 <= ny < height and not blocked[ny, nx]:
+                    yield nx, ny
 
-        for fire in agents.fires:
-            ax.scatter(fire.xPos, fire.yPos, color='red', label='Fire')
+    # invalidate the cells that lost every path of the old length
+    candidates = []
+    for x, y in cells:
+        distance = distances[y, x]
+        if np.isfinite(distance):
+            distances[y, x] = np.inf
+            for nx, ny in neighbors(x, y):
+                if distances[ny, nx] == distance + 1:
+                    heapq.heappush(candidates, (distance + 1, nx, ny))
+    raised = []
+    while candidates:
+        distance, x, y = heapq.heappop(candidates)
+        if distances[y, x] != distance:
+            continue  # already raised
+        if any(distances[ny, nx] == distance - 1 for nx, ny in neighbors(x, y)):
+            continue  # still supported by a path of the old length
+        distances[y, x] = np.inf
+        raised.append((x, y))
+        for nx, ny in neighbors(x, y):
+            if distances[ny, nx] == distance + 1:
+                heapq.heappush(candidates, (distance + 1, nx, ny))
 
-        ax.set_xticks(np.arange(0, self.width, 1))
-        ax.set_yticks(np.arange(0, self.height, 1))
-        ax.grid(True)
-        handles, labels = ax.get_legend_handles_labels()
-        by_label = dict(zip(labels, handles))
-        plt.legend(by_label.values(), by_label.keys())
-        plt.show()
+    # re-expand the raised cells from the intact cells around them
+    frontier = []
+    for x, y in raised:
+        distance = min((distances[ny, nx] for nx, ny in neighbors(x, y)), default=np.inf) + 1
+        if np.isfinite(distance):
+            distances[y, x] = distance
+            heapq.heappush(frontier, (distance, x, y))
+    while frontier:
+        distance, x, y = heapq.heappop(frontier)
+        if distances[y, x] < distance:
+            continue
+        for nx, ny in neighbors(x, y):
+            if distances[ny, nx] > distance + 1:
+                distances[ny, nx] = distance + 1
+                heapq.heappush(frontier, (distance + 1, nx, ny))
+    return np.array([y * width + x for x, y in raised], dtype=int)
@@ -0,0 +1,139 @@
+import itertools
+
+import numpy as np
+from environment import Environment
+from experiments import run_until_converged
+
+
+def build_layout(env_width, env_height, obstacle_positions):
+    """
+    Builds an empty environment holding only the obstacles of a layout.
+
+    Args:
+        env_width (int): The width of the environment grid.
+        env_height (int): The height of the environment grid.
+        obstacle_positions (list): The (x, y) positions of the obstacles.
+
+    Returns:
+        Environment: The environment used to compute distance fields.
+    """
+    environment = Environment(env_width, env_height)
+    for x, y in obstacle_positions:
+        environment.add_obstacle(x, y)
+    return environment
+
+
+def border_candidates(environment):
+    """
+    Lists every free cell on the border of the grid as a candidate exit position.
+
+    Args:
+        environment (Environment): The environment holding the layout.
+
+    Returns:
+        list: The (x, y) positions of the candidate exits.
+    """
+    width, height = environment.width, environment.height
+    cells = set()
+    for x in range(width):
+        cells.update({(x, 0), (x, height - 1)})
+    for y in range(height):
+        cells.update({(0, y), (width - 1, y)})
+    return sorted(cell for cell in cells if not environment.is_obstacle(*cell))
+
+
+def screen_configuration(environment, exits, balance_weight=1.0):
+    """
+    Scores an exit configuration from the cached distance fields of its exits.
+
+    The score is the mean distance from a walkable cell to its nearest exit,
+    scaled up by how far the largest catchment exceeds an even share of the
+    cells, so configurations whose exits would share the crowd evenly win.
+    Lower scores are better; cells that cannot reach any exit make the
+    configuration infeasible.
+
+    Args:
+        environment (Environment): The environment holding the layout.
+        exits (tuple): The (x, y) positions of the exits in the configuration.
+        balance_weight (float): The weight of the catchment imbalance term.
+
+    Returns:
+        dict: The screening score, mean distance and catchment size of each exit.
+    """
+    fields = np.stack([environment.distance_field(exit) for exit in exits])
+    walkable = np.ones((environment.height, environment.width), dtype=bool)
+    for x, y in environment.obstacles:
+        walkable[y, x] = False
+
+    nearest = fields.min(axis=0)[walkable]
+    if not np.all(np.isfinite(nearest)):
+        return {"score": float('inf'), "mean_distance": float('inf'), "catchments": []}
+
+    # every walkable cell is served by its closest exit
+    owner = fields.argmin(axis=0)[walkable]
+    catchments = np.bincount(owner, minlength=len(exits))
+    mean_distance = nearest.mean()
+    imbalance = catchments.max() / catchments.sum() - 1 / len(exits)
+    return {
+        "score": float(mean_distance * (1 + balance_weight * imbalance)),
+        "mean_distance": float(mean_distance),
+        "catchments": catchments.tolist(),
+    }
+
+
+def optimize_exits(env_width, env_height, num_people, num_fires, obstacle_positions, timeStep,
+                   num_exits=2, candidates=None, max_configurations=5000, shortlist=5, top_n=3,
+                   seed=None, **convergence):
+    """
+    Searches for the exit configurations that let the most people escape on a given layout.
+
+    Every configuration is first screened with the cached distance fields of its
+    exits. Only the `shortlist` best screened configurations are then simulated
+    with an adaptive ensemble (see experiments.run_until_converged).
+
+    Args:
+        env_width (int): The width of the environment grid.
+        env_height (int): The height of the environment grid.
+        num_people (int): The number of persons in the environment grid.
+        num_fires (int): The number of fires in the environment grid.
+        obstacle_positions (list): The (x, y) positions of the obstacles of the layout.
+        timeStep (int): The number of seconds the persons in the room have to escape.
+        num_exits (int): The number of exits in each configuration.
+        candidates (list): Candidate exit positions, the free border cells when None.
+        max_configurations (int): The maximum number of configurations to screen;
+            a random subset is screened when there are more.
+        shortlist (int): The number of screened configurations to simulate.
+        top_n (int): The number of configurations to return.
+        seed (int): Seed used to subsample configurations and to seed the replicas, so
+            every shortlisted configuration is simulated with the same random numbers.
+        **convergence: Stopping options passed to run_until_converged.
+
+    Returns:
+        list: Dicts with the exits, screening result and simulated metrics of the
+            best configurations, ordered by mean number of escapees.
+    """
+    environment = build_layout(env_width, env_height, obstacle_positions)
+    if candidates is None:
+        candidates = border_candidates(environment)
+
+    configurations = list(itertools.combinations(candidates, num_exits))
+    if len(configurations) > max_configurations:
+        rng = np.random.default_rng(seed)
+        picks = rng.choice(len(configurations), size=max_configurations, replace=False)
+        configurations = [configurations[i] for i in picks]
+
+    screened = sorted(((screen_configuration(environment, exits), exits) for exits in configurations),
+                      key=lambda item: item[0]["score"])
+
+    results = []
+    for screening, exits in screened[:shortlist]:
+        if not np.isfinite(screening["score"]):
+            break
+        params = dict(env_width=env_width, env_height=env_height, num_people=num_people,
+                      num_fires=num_fires, num_obstacles=len(obstacle_positions),
+                      exit_positions=list(exits), obstacle_positions=obstacle_positions)
+        ensemble = run_until_converged(params, timeStep, seed=seed, **convergence)
+        results.append({"exits": list(exits), "screening": screening, **ensemble})
+
+    results.sort(key=lambda result: result["metrics"]["num_escaped"]["mean"], reverse=True)
+    return results[:top_n]
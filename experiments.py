@@ -0,0 +1,158 @@
+import numpy as np
+from simulation import Simulation
+from telemetry import RunningStats
+
+# Metrics reported for every replica of an experiment
+METRICS = ("num_escaped", "num_dead", "time_to_clear")
+
+
+def run_replica(params, timeStep, seed=None):
+    """
+    Runs a single simulation without plotting or printing and collects its metrics.
+
+    Args:
+        params (dict): Keyword arguments for the Simulation constructor.
+        timeStep (int): The number of seconds the persons in the room have to escape.
+        seed (int or np.random.SeedSequence): Seed of the simulation's random generator.
+
+    Returns:
+        dict: The value of every metric in METRICS for this replica.
+    """
+    simulation = Simulation(**params, verbose=False, seed=seed)
+    for _ in range(timeStep):
+        simulation.step()
+        if simulation.time_to_clear is not None:
+            break
+    return collect_metrics(simulation)
+
+
+def collect_metrics(simulation):
+    """
+    Collects the metrics of a finished simulation.
+
+    A room that was not cleared within the time budget reports the elapsed time
+    as its time to clear, so the metric is censored at the budget; `cleared`
+    tells the censored replicas apart.
+
+    Args:
+        simulation (Simulation): The simulation to read the metrics from.
+
+    Returns:
+        dict: The value of every metric in METRICS, and whether the room was cleared.
+    """
+    time_to_clear = simulation.time_to_clear
+    cleared = time_to_clear is not None
+    if not cleared:
+        time_to_clear = simulation.timestep
+    return {
+        "num_escaped": simulation.num_escaped,
+        "num_dead": simulation.num_dead,
+        "time_to_clear": time_to_clear,
+        "cleared": cleared,
+    }
+
+
+def run_until_converged(params, timeStep, metric="num_escaped", ci_width=1.0, confidence=0.95,
+                        min_replicas=5, max_replicas=100, seed=None):
+    """
+    Runs replicas of a scenario until the confidence interval of the target metric
+    is narrower than `ci_width`, or until `max_replicas` simulations have been run.
+
+    Replicas that did not clear the room report the time budget as their time to
+    clear. They are counted as `capped`, and the time to clear never converges
+    while every replica is capped, since the interval then only reflects the budget.
+
+    Args:
+        params (dict): Keyword arguments for the Simulation constructor.
+        timeStep (int): The number of seconds the persons in the room have to escape.
+        metric (str): The metric whose interval controls stopping, one of METRICS.
+        ci_width (float): The requested full width of the confidence interval.
+        confidence (float): The confidence level of the interval.
+        min_replicas (int): The number of replicas to run before checking convergence.
+        max_replicas (int): The maximum number of replicas (the simulation budget).
+        seed (int): Seed from which the seed of every replica is derived; scenarios
+            run with the same seed share their random numbers replica by replica.
+
+    Returns:
+        dict: The mean, standard deviation and interval width of every metric,
+            the number of replicas run, the number of them that were capped at
+            the time budget, and whether the target width was reached.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}")
+
+    stats = {name: RunningStats() for name in METRICS}
+    seeds = np.random.SeedSequence(seed).spawn(max_replicas)
+    converged = False
+    capped = 0
+    while stats[metric].count < max_replicas:
+        result = run_replica(params, timeStep, seeds[stats[metric].count])
+        for name in METRICS:
+            stats[name].add(result[name])
+        capped += not result["cleared"]
+        if metric == "time_to_clear" and capped == stats[metric].count:
+            continue
+        if stats[metric].count >= min_replicas and stats[metric].ci_width(confidence) <= ci_width:
+            converged = True
+            break
+
+    return {
+        "replicas": stats[metric].count,
+        "capped": capped,
+        "converged": converged,
+        "metrics": {
+            name: {"mean": s.mean, "std": s.std, "ci_width": s.ci_width(confidence)}
+            for name, s in stats.items()
+        },
+    }
+
+
+def latin_hypercube(param_ranges, samples, seed=None):
+    """
+    Draws a Latin-hypercube sample over the given parameter ranges.
+
+    Every range is split into `samples` equally likely strata and each stratum is
+    used exactly once. Ranges given with integer bounds produce integer values.
+
+    Args:
+        param_ranges (dict): Maps a Simulation parameter name to a (low, high) tuple.
+        samples (int): The number of parameter points to draw.
+        seed (int): Seed of the random generator used for the sample.
+
+    Returns:
+        list: A list of `samples` dicts mapping parameter names to values.
+    """
+    rng = np.random.default_rng(seed)
+    points = [{} for _ in range(samples)]
+    for name, (low, high) in param_ranges.items():
+        # one random position inside each stratum, with the strata shuffled
+        u = (rng.permutation(samples) + rng.random(samples)) / samples
+        if isinstance(low, int) and isinstance(high, int):
+            values = np.floor(low + u * (high - low + 1)).astype(int)
+        else:
+            values = low + u * (high - low)
+        for point, value in zip(points, values):
+            point[name] = value.item()
+    return points
+
+
+def sensitivity_study(base_params, param_ranges, samples, timeStep, seed=None, **convergence):
+    """
+    Runs an adaptive ensemble at every point of a Latin-hypercube sample.
+
+    Args:
+        base_params (dict): Simulation parameters shared by all sample points.
+        param_ranges (dict): Maps a Simulation parameter name to a (low, high) tuple.
+        samples (int): The number of parameter points to draw.
+        timeStep (int): The number of seconds the persons in the room have to escape.
+        seed (int): Seed of the sample and of the replicas run at every point.
+        **convergence: Stopping options passed to run_until_converged.
+
+    Returns:
+        list: (point, result) tuples, one per sample point.
+    """
+    results = []
+    for point in latin_hypercube(param_ranges, samples, seed):
+        params = dict(base_params, **point)
+        results.append((point, run_until_converged(params, timeStep, seed=seed, **convergence)))
+    return results
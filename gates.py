@@ -0,0 +1,120 @@
+import numpy as np
+from telemetry import Telemetry
+
+
+def _cross(u, v):
+    """
+    Returns the z component of the cross product of two arrays of 2D vectors.
+    """
+    return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+
+class Gate:
+    """
+    Represents a virtual counting line across a door or corridor.
+
+    A person crosses the gate when their move during a step intersects the
+    segment from `start` to `end`. Moving onto the left-hand side of the
+    segment (seen from `start` looking at `end`) counts as a forward crossing,
+    moving back as a backward one.
+    """
+
+    def __init__(self, name, start, end, band=1.0, telemetry=None):
+        """
+        Initializes the Gate object.
+
+        Args:
+            name (str): The name of the gate.
+            start (tuple): The (x, y) position of the first end of the segment.
+            end (tuple): The (x, y) position of the second end of the segment.
+            band (float): Persons within this distance of the segment count
+                towards its density and speed.
+            telemetry (Telemetry): Creates the bounded series of the gate.
+        """
+        telemetry = Telemetry() if telemetry is None else telemetry
+        self.name = name
+        self.start = np.asarray(start, dtype=float)
+        self.end = np.asarray(end, dtype=float)
+        self.band = band
+        self.length = float(np.hypot(*(self.end - self.start)))
+        self.forward = telemetry.series(f"gate_{name}_forward", int, counts=True)  # forward crossings at each time step
+        self.backward = telemetry.series(f"gate_{name}_backward", int, counts=True)  # backward crossings at each time step
+        self.density = telemetry.series(f"gate_{name}_density")  # persons per cell area within the band
+        self.speed = telemetry.series(f"gate_{name}_speed")  # mean cells moved per step within the band
+
+    def crossings(self, previous, current) -> np.ndarray:
+        """
+        Detects the persons whose move crossed the gate.
+
+        Args:
+            previous (np.ndarray): An (N, 2) array of positions before the step.
+            current (np.ndarray): An (N, 2) array of positions after the step.
+
+        Returns:
+            np.ndarray: +1 for a forward crossing, -1 for a backward one, 0 otherwise.
+        """
+        along = self.end - self.start
+        side_before = _cross(along, previous - self.start)
+        side_after = _cross(along, current - self.start)
+        # half-open sides, so stopping on the line and moving on counts once
+        forward = (side_before < 0) & (side_after >= 0)
+        backward = (side_before >= 0) & (side_after < 0)
+
+        # the move must pass between the two ends of the gate
+        move = current - previous
+        within = _cross(move, self.start - previous) * _cross(move, self.end - previous) <= 0
+        return (forward & within).astype(int) - (backward & within).astype(int)
+
+    def distance(self, positions) -> np.ndarray:
+        """
+        Returns the distance of every position to the gate segment.
+
+        Args:
+            positions (np.ndarray): An (N, 2) array of positions.
+        """
+        along = self.end - self.start
+        t = np.clip((positions - self.start) @ along / max(along @ along, 1e-12), 0, 1)
+        return np.hypot(*(positions - (self.start + t[:, None] * along)).T)
+
+    def record(self, previous, current):
+        """
+        Records the crossings, density and speed of a single time step.
+
+        Args:
+            previous (np.ndarray): An (N, 2) array of positions before the step.
+            current (np.ndarray): An (N, 2) array of positions after the step.
+        """
+        crossed = self.crossings(previous, current)
+        self.forward.append(int(np.count_nonzero(crossed > 0)))
+        self.backward.append(int(np.count_nonzero(crossed < 0)))
+
+        nearby = self.distance(current) <= self.band
+        self.density.append(float(np.count_nonzero(nearby) / (2 * self.band * max(self.length, 1.0))))
+        moved = np.hypot(*(current[nearby] - previous[nearby]).T)
+        self.speed.append(float(moved.mean()) if len(moved) else 0.0)
+
+    def flow(self) -> np.ndarray:
+        """
+        Returns the net number of persons crossing forward at each time step.
+
+        With every-k downsampling an entry holds the crossings of all the steps
+        since the previous entry, so the total flow is kept.
+        """
+        return np.asarray(self.forward) - np.asarray(self.backward)
+
+    def fundamental_diagram(self) -> dict:
+        """
+        Returns the series of the fundamental diagram of the gate.
+
+        Returns:
+            dict: Per-step `density` (persons per cell area), `speed` (cells per step)
+                and `specific_flow` (crossings per step and unit of gate length).
+        """
+        # number of steps summed into each entry of the crossing counts
+        steps = np.minimum(self.forward.steps() + 1, self.forward.every) if self.forward.window == 1 else 1
+        crossings = np.asarray(self.forward) + np.asarray(self.backward)
+        return {
+            "density": np.asarray(self.density),
+            "speed": np.asarray(self.speed),
+            "specific_flow": crossings / steps / max(self.length, 1.0),
+        }
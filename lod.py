@@ -0,0 +1,154 @@
+import time
+
+import numpy as np
+from simulation import Simulation
+
+# Distance to a fire within which a person's panic rises (see Person.update_panic)
+PANIC_DISTANCE = 3
+
+
+class LevelOfDetail:
+    """
+    Decides which persons need the full update in a step of the grid movement.
+
+    Persons near a fire, near an exit or inside a crowd get the full update:
+    panic, the congestion scan over all persons and, when panicking, the
+    search for their neighbors. Everyone else is in a quiet region and only
+    keeps walking towards the exit chosen at their last full update, which
+    is re-evaluated every `interval` steps. Larger radii and a shorter
+    interval give results closer to the full model at a higher cost.
+    """
+
+    def __init__(self, fire_radius=5, exit_radius=3, crowd_radius=2, crowd_size=5, interval=8):
+        """
+        Initializes the LevelOfDetail object.
+
+        Args:
+            fire_radius (float): Persons closer to a fire than this get the full update; at
+                least the panic distance of 3, so the panic of the other persons only calms down.
+            exit_radius (float): Persons within this walking distance of an exit get the full update.
+            crowd_radius (int): Half the side of the square around a person in which crowds are counted.
+            crowd_size (int): Persons with more than this many others around them get the full update.
+            interval (int): Quiet persons get a full update every `interval` steps, 1 for always.
+        """
+        if fire_radius < PANIC_DISTANCE:
+            raise ValueError(f"fire_radius must be at least the panic distance of {PANIC_DISTANCE}")
+        self.fire_radius = fire_radius
+        self.exit_radius = exit_radius
+        self.crowd_radius = crowd_radius
+        self.crowd_size = crowd_size
+        self.interval = interval
+        self.full_updates = 0  # number of full person updates so far
+        self.quiet_updates = 0  # number of cheap person updates so far
+
+    def quiet(self, persons, environment, timestep) -> np.ndarray:
+        """
+        Selects the persons that can skip the full update in this step.
+
+        Args:
+            persons (list): The persons to update.
+            environment (Environment): The environment the persons move in.
+            timestep (int): The current time step, used to stagger the periodic full updates.
+
+        Returns:
+            np.ndarray: A boolean array, True for the persons that only follow their exit.
+        """
+        if not persons:
+            return np.zeros(0, dtype=bool)
+        cells = np.array([p.cell() for p in persons]).reshape(-1, 2)
+        xs, ys = cells[:, 0], cells[:, 1]
+        calm = np.fromiter((p.panic < 3 and getattr(p, "target_exit", None) is not None for p in persons),
+                           dtype=bool, count=len(persons))
+        refresh = (np.arange(len(persons)) + timestep) % self.interval == 0
+        quiet = calm & ~refresh
+        quiet &= environment.exit_field()[ys, xs] > self.exit_radius
+        quiet &= ~self._near_fire(environment)[ys, xs]
+        quiet &= self._crowding(cells, environment)[ys, xs] <= self.crowd_size
+        self.quiet_updates += int(np.count_nonzero(quiet))
+        self.full_updates += len(persons) - int(np.count_nonzero(quiet))
+        return quiet
+
+    def _near_fire(self, environment) -> np.ndarray:
+        """
+        Returns a (height, width) boolean array of the cells closer to a fire than `fire_radius`.
+        """
+        near = np.zeros((environment.height, environment.width), dtype=bool)
+        if not environment.fires:
+            return near
+        reach = int(np.ceil(self.fire_radius))
+        burning = np.zeros((environment.height + 2 * reach, environment.width + 2 * reach), dtype=bool)
+        xs, ys = np.array([(int(f.xPos), int(f.yPos)) for f in environment.fires]).T
+        burning[ys + reach, xs + reach] = True
+        for dy in range(-reach, reach + 1):
+            for dx in range(-reach, reach + 1):
+                if dx * dx + dy * dy < self.fire_radius ** 2:
+                    near |= burning[reach - dy:reach - dy + environment.height, reach - dx:reach - dx + environment.width]
+        return near
+
+    def _crowding(self, cells, environment) -> np.ndarray:
+        """
+        Returns the number of other persons in the square around every cell, for an occupied cell.
+        """
+        width, height, r = environment.width, environment.height, self.crowd_radius
+        counts = np.bincount(cells[:, 1] * width + cells[:, 0], minlength=width * height).reshape(height, width)
+        # box sums from the summed-area table of the padded counts
+        table = np.pad(counts, ((r + 1, r), (r + 1, r))).cumsum(axis=0).cumsum(axis=1)
+        size = 2 * r + 1
+        window = table[size:, size:] - table[:-size, size:] - table[size:, :-size] + table[:-size, :-size]
+        return window - 1
+
+
+def compare_level_of_detail(params, timeStep, levels, replicas=5, seed=None):
+    """
+    Measures the error and the speedup of level-of-detail settings against the full model.
+
+    Every setting is run on the same replicas as the full model, so the
+    differences come from the skipped updates alone.
+
+    Args:
+        params (dict): Keyword arguments for the Simulation constructor.
+        timeStep (int): The number of seconds the persons in the room have to escape.
+        levels (list): The LevelOfDetail settings to compare.
+        replicas (int): The number of replicas to run for every setting.
+        seed (int): Seed from which the seed of every replica is derived.
+
+    Returns:
+        list: One dict per setting with the mean and maximum absolute error of the
+            number of escaped persons, the mean number escaped by the full model,
+            the share of cheap updates and the speedup over the full model.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(replicas)
+
+    def run(level, replica_seed):
+        simulation = Simulation(**params, verbose=False, seed=replica_seed, level_of_detail=level)
+        start = time.perf_counter()
+        for _ in range(timeStep):
+            simulation.step()
+            if simulation.time_to_clear is not None:
+                break
+        return simulation.num_escaped, time.perf_counter() - start
+
+    full = [run(None, replica_seed) for replica_seed in seeds]
+    full_time = sum(elapsed for _, elapsed in full)
+    report = []
+    for level in levels:
+        results, errors, elapsed = [], [], 0.0
+        for replica_seed, (escaped, _) in zip(seeds, full):
+            # a fresh copy per replica, so the update counts cover this setting alone
+            level_copy = LevelOfDetail(level.fire_radius, level.exit_radius, level.crowd_radius,
+                                       level.crowd_size, level.interval)
+            replica_escaped, replica_time = run(level_copy, replica_seed)
+            results.append(level_copy)
+            errors.append(abs(replica_escaped - escaped))
+            elapsed += replica_time
+        cheap = sum(r.quiet_updates for r in results)
+        total = cheap + sum(r.full_updates for r in results)
+        report.append({
+            "level": level,
+            "mean_abs_error": float(np.mean(errors)),
+            "max_abs_error": int(np.max(errors)),
+            "full_escaped": float(np.mean([escaped for escaped, _ in full])),
+            "quiet_share": cheap / total if total else 0.0,
+            "speedup": full_time / elapsed if elapsed else float('inf'),
+        })
+    return report
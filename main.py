@@ -1,9 +1,11 @@
 from simulation import Simulation
 import matplotlib.pyplot as plt
 import numpy as np
-import random as random
 import time
 
+# random generator used to pick exit positions
+rng = np.random.default_rng()
+
 def main():
     env_height = 20
     env_width = 20
@@ -235,7 +237,7 @@ def calculate_and_plot_exit_variation(simulations, timeStep, env_width, env_heig
     # loop thru the specified number of simulation iterations
     for i in range(simulations):
         # obtain a random coordinate from the grid
-        rand_coord = random.randint(env_height - env_width + 1, env_height - 1)
+        rand_coord = int(rng.integers(env_height - env_width + 1, env_height))
         
         # put together the two new exit location positions
         exit_locs = [(env_height - env_width + 1, rand_coord), (rand_coord, env_height - 1)]
@@ -357,8 +359,8 @@ def plot_various_grid_sims(simulations, timeStep, persons, num_fires, num_obstac
         escaped_counts = []  
         
         # get two random numbers to represent exit positions
-        rand_coordX = random.randint(1, grid_size - 1)
-        rand_coordY = random.randint(1, grid_size - 1 )     
+        rand_coordX = int(rng.integers(1, grid_size))
+        rand_coordY = int(rng.integers(1, grid_size))     
         
         # loop thru specified number of simulations
         for _ in range(simulations):
@@ -0,0 +1,403 @@
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from exit_optimizer import build_layout
+from experiments import collect_metrics
+from simulation import Simulation
+
+# Distance fields of the fixed layouts seen by this worker process
+_layout_cache = {}
+
+# HTTP reason phrases for the status codes the service answers with
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+def _warm_layout(simulation, params):
+    """
+    Reuses the distance fields of a fixed layout across the jobs of a worker.
+
+    Args:
+        simulation (Simulation): The simulation about to be run.
+        params (dict): The Simulation parameters of the job.
+    """
+    obstacles = params.get("obstacle_positions")
+    if obstacles is None:
+        return
+    environment = simulation.agents.environment
+    key = (environment.width, environment.height, frozenset(map(tuple, obstacles)))
+    fields = _layout_cache.setdefault(key, {})
+    missing = [exit for exit in environment.exits if exit not in fields]
+    if missing:
+        layout = build_layout(environment.width, environment.height, obstacles)
+        for exit in missing:
+            fields[exit] = layout.distance_field(exit)
+    # the cached fields only know the obstacles, the fires of this job are blocked on the copies
+    environment.distance_fields = {exit: fields[exit].copy() for exit in environment.exits}
+    environment.block([(fire.xPos, fire.yPos) for fire in environment.fires])
+
+
+def run_job(job_id, params, timeStep, progress, cancelled):
+    """
+    Runs the simulation of a job inside a worker process.
+
+    Args:
+        job_id (int): The id of the job.
+        params (dict): Keyword arguments for the Simulation constructor.
+        timeStep (int): The number of seconds the persons in the room have to escape.
+        progress (Queue): Queue receiving the progress metrics of every step.
+        cancelled (Event): Event set by the service when the job is cancelled.
+
+    Returns:
+        dict: The metrics of the run and whether it was cancelled.
+    """
+    simulation = Simulation(**params, verbose=False)
+    _warm_layout(simulation, params)
+    for _ in range(timeStep):
+        if cancelled.is_set():
+            return {"cancelled": True, **collect_metrics(simulation)}
+        simulation.step()
+        progress.put({
+            "job": job_id,
+            "step": simulation.timestep,
+            "num_escaped": simulation.num_escaped,
+            "num_dead": simulation.num_dead,
+            "remaining": len(simulation.agents.persons),
+        })
+        if simulation.time_to_clear is not None:
+            break
+    return {"cancelled": False, **collect_metrics(simulation)}
+
+
+class Job:
+    """
+    Represents a simulation job queued on the service.
+    """
+
+    def __init__(self, job_id, params, timeStep, cancelled, history=100):
+        """
+        Initializes the Job object.
+
+        Args:
+            job_id (int): The id of the job.
+            params (dict): Keyword arguments for the Simulation constructor.
+            timeStep (int): The number of seconds the persons in the room have to escape.
+            cancelled (Event): Event shared with the worker to request cancellation.
+            history (int): The number of recent progress events kept for new subscribers.
+        """
+        self.id = job_id
+        self.params = params
+        self.timeStep = timeStep
+        self.cancelled = cancelled
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.future = None
+        self.events = deque(maxlen=history)
+        self.subscribers = set()
+
+    def publish(self, event):
+        """
+        Records a progress event and forwards it to every subscriber.
+
+        Args:
+            event (dict): The progress event, or None once the job has finished.
+        """
+        if event is not None:
+            self.events.append(event)
+        for subscriber in self.subscribers:
+            subscriber.put_nowait(event)
+
+    def describe(self):
+        """
+        Returns the JSON-serializable state of the job.
+        """
+        return {
+            "id": self.id,
+            "status": self.status,
+            "timeStep": self.timeStep,
+            "progress": self.events[-1] if self.events else None,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobService:
+    """
+    Queues simulation jobs onto a pool of long-lived worker processes and
+    serves them over a small HTTP/JSON interface.
+
+    Routes:
+        POST   /jobs              submit {"params": {...}, "timeStep": n}
+        GET    /jobs              list all jobs
+        GET    /jobs/<id>         state and result of a job
+        GET    /jobs/<id>/events  newline-delimited JSON progress stream
+        DELETE /jobs/<id>         cancel a queued or running job
+    """
+
+    def __init__(self, workers=None, retain=100):
+        """
+        Initializes the JobService object.
+
+        Args:
+            workers (int): The number of worker processes, the CPU count when None.
+            retain (int): The number of finished jobs kept; older ones are forgotten.
+        """
+        # workers are started lazily while clients are connected; forked ones would inherit
+        # and hold open the client and listening sockets, so they are spawned instead
+        context = multiprocessing.get_context("spawn")
+        self.manager = context.Manager()
+        self.progress = self.manager.Queue()
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        self.jobs = {}
+        self.retain = retain
+        self._ids = itertools.count(1)
+        self._pump = None
+        self._stopping = threading.Event()
+
+    def submit(self, params, timeStep):
+        """
+        Queues a new job on the worker pool.
+
+        Args:
+            params (dict): Keyword arguments for the Simulation constructor.
+            timeStep (int): The number of seconds the persons in the room have to escape.
+
+        Returns:
+            Job: The queued job.
+        """
+        if "exit_positions" in params:
+            params["exit_positions"] = [tuple(exit) for exit in params["exit_positions"]]
+        job = Job(next(self._ids), params, timeStep, self.manager.Event())
+        self.jobs[job.id] = job
+        job.future = self.pool.submit(run_job, job.id, params, timeStep, self.progress, job.cancelled)
+        asyncio.get_running_loop().create_task(self._watch(job))
+        return job
+
+    def cancel(self, job):
+        """
+        Cancels a job, removing it from the queue or stopping it at its next step.
+
+        Args:
+            job (Job): The job to cancel.
+        """
+        if job.status in ("done", "failed", "cancelled"):
+            return
+        job.cancelled.set()
+        job.future.cancel()  # only succeeds while the job is still queued
+
+    async def _watch(self, job):
+        """
+        Waits for the worker to finish a job and records its outcome.
+        """
+        try:
+            job.result = await asyncio.wrap_future(job.future)
+            job.status = "cancelled" if job.result["cancelled"] else "done"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as error:
+            job.status = "failed"
+            job.error = repr(error)
+        job.publish(None)
+        self._evict()
+
+    def _evict(self):
+        """
+        Forgets the oldest finished jobs beyond the retention limit.
+        """
+        finished = [job_id for job_id, job in self.jobs.items()
+                    if job.status in ("done", "failed", "cancelled")]
+        for job_id in finished[:max(len(finished) - self.retain, 0)]:
+            del self.jobs[job_id]
+
+    def _pump_progress(self, loop):
+        """
+        Moves progress events from the worker queue to the event loop.
+
+        Runs on its own daemon thread and polls the queue, so it notices
+        `_stopping` and never keeps the interpreter or the loop from exiting.
+
+        Args:
+            loop (asyncio.AbstractEventLoop): The loop serving the subscribers.
+        """
+        while not self._stopping.is_set():
+            try:
+                event = self.progress.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return  # the manager has shut down
+            try:
+                loop.call_soon_threadsafe(self._dispatch, event)
+            except RuntimeError:
+                return  # the loop has closed
+
+    def _dispatch(self, event):
+        """
+        Forwards a progress event to the subscribers of its job.
+        """
+        job = self.jobs.get(event["job"])
+        if job is not None:
+            job.status = "running" if job.status == "queued" else job.status
+            job.publish(event)
+
+    async def handle(self, reader, writer):
+        """
+        Serves a single HTTP request.
+        """
+        try:
+            request_line = (await reader.readline()).decode().split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode().strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            if len(request_line) < 2:
+                await self._respond(writer, 400, {"error": "malformed request"})
+                return
+            await self._route(request_line[0], request_line[1], body, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, body, writer):
+        """
+        Dispatches a request to the matching route.
+        """
+        parts = [part for part in path.split("/") if part]
+        if parts == ["jobs"] and method == "POST":
+            try:
+                spec = json.loads(body or b"{}")
+                job = self.submit(dict(spec["params"]), int(spec["timeStep"]))
+            except (ValueError, KeyError, TypeError) as error:
+                await self._respond(writer, 400, {"error": f"invalid job: {error!r}"})
+                return
+            await self._respond(writer, 201, job.describe())
+        elif parts == ["jobs"] and method == "GET":
+            await self._respond(writer, 200, [job.describe() for job in self.jobs.values()])
+        elif len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.jobs.get(int(parts[1])) if parts[1].isdigit() else None
+            if job is None:
+                await self._respond(writer, 404, {"error": "no such job"})
+            elif len(parts) == 3 and parts[2] == "events" and method == "GET":
+                await self._stream(job, writer)
+            elif len(parts) == 2 and method == "GET":
+                await self._respond(writer, 200, job.describe())
+            elif len(parts) == 2 and method == "DELETE":
+                self.cancel(job)
+                await self._respond(writer, 200, job.describe())
+            else:
+                await self._respond(writer, 405, {"error": "method not allowed"})
+        else:
+            await self._respond(writer, 404, {"error": "no such route"})
+
+    async def _respond(self, writer, status, payload):
+        """
+        Writes a complete JSON response.
+        """
+        body = json.dumps(payload).encode()
+        writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                     f"Content-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def _stream(self, job, writer):
+        """
+        Streams the progress events of a job until it finishes.
+        """
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: application/x-ndjson\r\n"
+                     b"Connection: close\r\n\r\n")
+        events = asyncio.Queue()
+        for event in job.events:
+            events.put_nowait(event)
+        if job.status in ("done", "failed", "cancelled"):
+            events.put_nowait(None)
+        job.subscribers.add(events)
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                writer.write(json.dumps(event).encode() + b"\n")
+                await writer.drain()
+            writer.write(json.dumps(job.describe()).encode() + b"\n")
+            await writer.drain()
+        finally:
+            job.subscribers.discard(events)
+
+    async def serve(self, host="127.0.0.1", port=8765, socket_path=None):
+        """
+        Serves requests until the process is interrupted.
+
+        Args:
+            host (str): The address to listen on.
+            port (int): The TCP port to listen on.
+            socket_path (str): A Unix socket path to listen on instead of TCP.
+        """
+        self._stopping.clear()
+        self._pump = threading.Thread(target=self._pump_progress, args=(asyncio.get_running_loop(),),
+                                      name="progress-pump", daemon=True)
+        self._pump.start()
+        try:
+            if socket_path is not None:
+                server = await asyncio.start_unix_server(self.handle, path=socket_path)
+            else:
+                server = await asyncio.start_server(self.handle, host, port)
+            print(f"Serving simulation jobs on {socket_path or f'http://{host}:{port}'}")
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._stop_pump()
+
+    def _stop_pump(self):
+        """
+        Stops the progress pump and waits for its thread to finish.
+        """
+        self._stopping.set()
+        if self._pump is not None:
+            self._pump.join()
+            self._pump = None
+
+    def shutdown(self):
+        """
+        Stops the progress pump, the worker pool and the progress manager.
+        """
+        self._stop_pump()
+        for job in self.jobs.values():
+            job.cancelled.set()
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.manager.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local job service for crowd evacuation simulations.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--socket", help="serve on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--retain", type=int, default=100, help="number of finished jobs kept")
+    args = parser.parse_args()
+
+    service = JobService(args.workers, args.retain)
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,17 @@
 import numpy as np
 from agent import Agents
 from environment import Environment
-import matplotlib.pyplot as plt
+from social_force import SocialForceModel
+from telemetry import RunningStats, Telemetry
 
 class Simulation:
     """
     Represents the simulation of the environment with agents.
     """
 
-    def __init__(self, env_width, env_height, num_people, num_fires, num_obstacles, exit_positions):
+    def __init__(self, env_width, env_height, num_people, num_fires, num_obstacles, exit_positions, verbose=True,
+                 obstacle_positions=None, seed=None, spawn_density=None, telemetry=None, movement="grid",
+                 level_of_detail=None):
         """
         Initializes the Simulation object with the specified parameters.
 
@@ -19,65 +22,96 @@ class Simulation:
             num_fires (int): The number of fires in the simulation.
             num_obstacles (int): The number of obstacles in the environment.
             exit_positions (list): A list of tuples representing the positions of exits.
+            verbose (bool): Whether to print per-step progress and results.
+            obstacle_positions (list): Fixed obstacle positions to use instead of `num_obstacles` random ones.
+            seed (int): Seed of the simulation's random generator, fresh entropy when None.
+            spawn_density (np.ndarray): A (height, width) array of relative weights for placing people.
+            telemetry (Telemetry): Bounds the memory of the recorded series, 10000 entries each when None.
+            movement (str or SocialForceModel): "grid" for unit steps between cells, "social_force"
+                (or a configured SocialForceModel) for continuous social-force movement.
+            level_of_detail (LevelOfDetail): Gives persons in quiet regions a cheaper update
+                in the grid movement, every person gets the full update when None.
         """
-        environment = Environment(env_width, env_height)
-        self.agents = Agents(environment, num_people, num_fires)
+        self.rng = np.random.default_rng(seed)
+        self.telemetry = Telemetry() if telemetry is None else telemetry
+        environment = Environment(env_width, env_height, self.rng, self.telemetry)
+        environment.verbose = verbose
+        self.verbose = verbose
         self.timestep = 0
         self.num_escaped = 0
-        self.escaped_counts = []
-        self.escaped_persons = []
-        self.bottleneck_areas = []
+        self.escaped_counts = self.telemetry.series("escaped_counts", int)
+        self.escape_times = RunningStats()  # escape times without keeping the escaped persons
+        self.bottleneck_areas = self.telemetry.series("bottleneck_areas", int)
         self.total_person = num_people
+        self.num_dead = 0
+        self.time_to_clear = None  # None means people are still inside
         self.obstacle_count = 0
+        if movement == "social_force":
+            movement = SocialForceModel()
+        elif movement != "grid" and not isinstance(movement, SocialForceModel):
+            raise ValueError(f"Unknown movement '{movement}', expected 'grid' or 'social_force'")
+        self.social_force = movement if isinstance(movement, SocialForceModel) else None
+        self.level_of_detail = level_of_detail
 
         
-        # Generate random positions for obstacles
-        for i in range(num_obstacles):
-            x, y = np.random.randint(0, env_width), np.random.randint(0, env_height)
+        # Generate random positions for obstacles unless a fixed layout is given
+        if obstacle_positions is None:
+            obstacle_positions = zip(self.rng.integers(0, env_width, num_obstacles).tolist(),
+                                     self.rng.integers(0, env_height, num_obstacles).tolist())
+        for x, y in obstacle_positions:
             environment.add_obstacle(x, y)
             self.obstacle_count += 1
 
         # Add exits to the environment
         for exit in exit_positions:
             environment.add_exit(*exit)
+
+        # Place people and fires once the layout is known, so they land on free cells
+        self.agents = Agents(environment, num_people, num_fires, self.rng, spawn_density)
             
     def calculate_bottleneck_areas(self, threshold=2):
         """
         Calculate the number of bottleneck areas in the simulation.
         A bottleneck area is defined as any location that has more than `threshold` agents.
         """
-        num_bottleneck_areas = 0
-        for i in range(self.agents.environment.width):
-            for j in range(self.agents.environment.height):
-                # Count the number of agents in this cell
-                num_agents = sum(1 for agent in self.agents.persons if int(agent.xPos) == i and int(agent.yPos) == j)
-                if num_agents > threshold:
-                    num_bottleneck_areas += 1
-        self.bottleneck_areas.append(num_bottleneck_areas)
+        environment = self.agents.environment
+        positions = np.rint(self.agents.positions()).astype(int)
+        # Count the number of agents in every cell at once
+        num_agents = np.bincount(positions[:, 1] * environment.width + positions[:, 0],
+                                 minlength=environment.width * environment.height)
+        self.bottleneck_areas.append(int(np.count_nonzero(num_agents > threshold)))
         
     @staticmethod
     def plot_bottleneck_areas(simulation_list):
-        plt.figure(figsize=(10, 6))
-        for simulation in simulation_list:
-            # Get the count of bottleneck areas at each timestep
-            bottleneck_counts = simulation.bottleneck_areas  # directly use the numbers
-            time_steps = range(1, len(bottleneck_counts) + 1)
-            plt.plot(time_steps, bottleneck_counts, marker='o', label=f"Simulation with {simulation.total_person} persons")
-            plt.xlabel('Time step')
-            plt.ylabel('Number of bottlenecks')
-            plt.title('Bottleneck Areas over Time')
-            plt.legend()
-        plt.show()
+        from visualization import plot_bottleneck_areas  # matplotlib is only loaded when plotting
+        plot_bottleneck_areas(simulation_list)
 
     def step(self):
         """
         Performs a single step in the simulation, updating the positions and states of the agents.
         """
         surviving_people = []  # Create a new list for people who are still alive
+        persons = self.agents.persons
+        if self.agents.environment.gates:
+            previous_positions = self.agents.positions()
+
+        if self.social_force is not None:
+            # all persons are moved at once by the social-force model
+            self.social_force.step([p for p in persons if not p.is_dead()], self.agents.environment)
+
+        quiet = np.zeros(len(persons), dtype=bool)
+        if self.social_force is None and self.level_of_detail is not None:
+            quiet = self.level_of_detail.quiet(persons, self.agents.environment, self.timestep)
 
-        for person in self.agents.persons:
-            person.update_panic()
-            if not person.is_dead():
+        for person, is_quiet in zip(persons, quiet.tolist()):
+            if is_quiet:
+                # far from any fire the panic only calms down, and the person keeps to their exit
+                person.panic = max(0, person.panic - 1)
+                if not person.is_dead() and not person.escaped:
+                    person.move_towards(person.target_exit)
+            elif self.social_force is None:
+                person.update_panic()
+            if self.social_force is None and not is_quiet and not person.is_dead():
                 if not person.escaped:
                     if person.panic < 3:
                         person.move_towards_least_congested_exit()
@@ -85,39 +119,45 @@ class Simulation:
                         person.move_towards_least_congested_exit(consider_others=True)
                     else:  # High panic level: follow the crowd
                         person.follow_crowd(self.agents.persons)
-            # After updating each person's state, update the environment.
-            self.agents.environment.add_person(person)
-
 
             if person.is_escaped(self.timestep):
                 person.time_to_escape = self.timestep
-                self.escaped_persons.append(person)
+                self.escape_times.add(self.timestep)
             elif person.is_dead():
-                print(f"Person at ({person.xPos}, {person.yPos}) has died!")
+                self.num_dead += 1
+                if self.verbose:
+                    print(f"Person at ({person.xPos}, {person.yPos}) has died!")
             else:
                 surviving_people.append(person)  # Only add person to new list if they are not dead or escaped
+
+        if self.agents.environment.gates:
+            self.agents.environment.record_gates(previous_positions, self.agents.positions(persons))
                 
         self.timestep += 1
         self.agents.persons = surviving_people  # Replace old list with new one
-        self.escaped_counts.append(len(self.escaped_persons))  # Record the number of escaped people
+        # After updating every person's state, update the environment once.
+        self.agents.environment.persons = list(surviving_people)
+        self.agents.environment.refresh_grid()
+        self.num_escaped = self.escape_times.count
+        self.escaped_counts.append(self.num_escaped)  # Record the number of escaped people
 
         self.calculate_bottleneck_areas()
-
-        escape_times = [p.time_to_escape for p in self.escaped_persons]
-        self.num_escaped = len(self.escaped_persons)
+        if not self.agents.persons and self.time_to_clear is None:
+            self.time_to_clear = self.timestep
             
         
         # Print the results
-        print(f"Number of people who escaped: {self.num_escaped}")
-        if self.num_escaped > 0:
-            print(f"Average escape time: {sum(escape_times) / self.num_escaped}")
-            print(f"Minimum escape time: {min(escape_times)}")
-            print(f"Maximum escape time: {max(escape_times)}")
+        if self.verbose:
+            print(f"Number of people who escaped: {self.num_escaped}")
+        if self.verbose and self.num_escaped > 0:
+            print(f"Average escape time: {self.escape_times.mean}")
+            print(f"Minimum escape time: {self.escape_times.min}")
+            print(f"Maximum escape time: {self.escape_times.max}")
             
         
 
+        self.agents.spread_fires()
         for fire in self.agents.fires:
-            fire.fire_spread()
             fire.calculate_effect(self.agents.persons)
             # After updating each fire's state, update the environment.
             self.agents.environment.add_fire(fire)
@@ -0,0 +1,240 @@
+import numpy as np
+
+# (dx, dy) of the 8 neighboring cells
+NEIGHBORS = np.array([(dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if (dx, dy) != (0, 0)])
+
+# (dx, dy) of the cells within the distance at which a fire raises panic (< 3)
+PANIC_OFFSETS = [(dx, dy) for dy in range(-2, 3) for dx in range(-2, 3) if dx * dx + dy * dy < 9]
+
+
+def neighbor_pairs(positions, cutoff):
+    """
+    Finds every pair of positions closer than `cutoff` using a cell list.
+
+    Positions are binned into square cells of side `cutoff`, so only the
+    3x3 bins around a position have to be searched and the cost grows with
+    the number of close pairs instead of N^2.
+
+    Args:
+        positions (np.ndarray): An (N, 2) array of positions.
+        cutoff (float): The interaction range.
+
+    Returns:
+        tuple: Arrays (i, j) of the pair indices with i < j.
+    """
+    count = len(positions)
+    if count < 2:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    bins = np.floor(positions / cutoff).astype(np.int64)
+    bins -= bins.min(axis=0) - 1  # leave an empty ring of bins around the crowd
+    columns = bins[:, 0].max() + 2
+    keys = bins[:, 1] * columns + bins[:, 0]
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    all_keys = np.arange((bins[:, 1].max() + 2) * columns)
+    starts = np.searchsorted(sorted_keys, all_keys, side="left")
+    ends = np.searchsorted(sorted_keys, all_keys, side="right")
+
+    first, second = [], []
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            neighbor = keys + dy * columns + dx
+            lengths = ends[neighbor] - starts[neighbor]
+            i = np.repeat(np.arange(count), lengths)
+            # position of every candidate inside its bin's run of the sorted order
+            offsets = np.arange(len(i)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            j = order[np.repeat(starts[neighbor], lengths) + offsets]
+            keep = i < j
+            first.append(i[keep])
+            second.append(j[keep])
+    i, j = np.concatenate(first), np.concatenate(second)
+    close = np.einsum("ij,ij->i", positions[i] - positions[j], positions[i] - positions[j]) < cutoff * cutoff
+    return i[close], j[close]
+
+
+class SocialForceModel:
+    """
+    Moves persons with continuous positions and velocities under a social-force model.
+
+    Every person accelerates towards their desired velocity, pointing down the
+    distance field of the nearest exit, and is pushed away by nearby persons and
+    by obstacle cells and the walls around the grid. Overlapping bodies add a
+    contact force, which is reported as crowd pressure. Panic raises the desired
+    speed and makes persons copy the direction of their neighbors (herding).
+    Positions are in cell units, with cell (x, y) centered on (x, y).
+    """
+
+    def __init__(self, desired_speed=1.0, relaxation_time=0.5, radius=0.3, repulsion=2.0, repulsion_range=0.2,
+                 wall_repulsion=2.0, wall_range=0.2, body_stiffness=20.0, cutoff=2.0, panic_speedup=0.5,
+                 herding=0.5, substeps=4):
+        """
+        Initializes the SocialForceModel object.
+
+        Args:
+            desired_speed (float): The walking speed of a calm person, in cells per time step.
+            relaxation_time (float): The time, in steps, to reach the desired velocity.
+            radius (float): The body radius of a person, in cells.
+            repulsion (float): The strength of the repulsion between persons.
+            repulsion_range (float): The decay length of the repulsion between persons.
+            wall_repulsion (float): The strength of the repulsion from walls and obstacles.
+            wall_range (float): The decay length of the repulsion from walls and obstacles.
+            body_stiffness (float): The contact force per unit of overlap between bodies.
+            cutoff (float): The range beyond which persons do not interact.
+            panic_speedup (float): The relative increase of the desired speed at full panic.
+            herding (float): The weight of the neighbors' direction at full panic.
+            substeps (int): The number of integration steps per time step.
+        """
+        self.desired_speed = desired_speed
+        self.relaxation_time = relaxation_time
+        self.radius = radius
+        self.repulsion = repulsion
+        self.repulsion_range = repulsion_range
+        self.wall_repulsion = wall_repulsion
+        self.wall_range = wall_range
+        self.body_stiffness = body_stiffness
+        self.cutoff = cutoff
+        self.panic_speedup = panic_speedup
+        self.herding = herding
+        self.substeps = substeps
+        self.pressure = np.zeros(0)  # contact force on every person in the last step
+
+    def step(self, persons, environment):
+        """
+        Updates the panic, velocity and position of the persons for one time step.
+
+        Args:
+            persons (list): The Person objects to move.
+            environment (Environment): The environment the persons move in.
+        """
+        if not persons:
+            self.pressure = np.zeros(0)
+            return
+        state = np.fromiter((v for p in persons for v in (p.xPos, p.yPos, p.vx, p.vy, p.panic)),
+                            dtype=float, count=5 * len(persons)).reshape(-1, 5)
+        positions, velocities = state[:, :2].copy(), state[:, 2:4].copy()
+
+        blocked = np.pad(environment.blocked, 1, constant_values=True)  # obstacles and fires
+        field = np.pad(environment.exit_field(), 1, constant_values=np.inf)
+        panic = self._update_panic(positions, state[:, 4], environment)
+        fear = np.minimum(panic, 10) / 10
+
+        dt = 1.0 / self.substeps
+        pressure = np.zeros(len(persons))
+        for _ in range(self.substeps):
+            i, j = neighbor_pairs(positions, self.cutoff)
+            goal = self._desired_direction(positions, field, fear, velocities, i, j)
+            desired = goal * (self.desired_speed * (1 + self.panic_speedup * fear))[:, None]
+            force = (desired - velocities) / self.relaxation_time
+            push, contact = self._agent_forces(positions, i, j)
+            wall_push, wall_contact = self._wall_forces(positions, blocked)
+            force += push + wall_push
+            pressure = contact + wall_contact
+
+            velocities += force * dt
+            speed = np.hypot(*velocities.T)
+            limit = 1.3 * self.desired_speed * (1 + self.panic_speedup * fear)
+            too_fast = speed > limit
+            velocities[too_fast] *= (limit[too_fast] / speed[too_fast])[:, None]
+            positions = self._move(positions, velocities, dt, blocked)
+
+        self.pressure = pressure
+        for person, (x, y), (vx, vy), level in zip(persons, positions.tolist(), velocities.tolist(), panic.tolist()):
+            person.xPos, person.yPos, person.vx, person.vy, person.panic = x, y, vx, vy, int(level)
+
+    def _update_panic(self, positions, panic, environment):
+        """
+        Raises the panic of persons within distance 3 of a fire and calms the others down.
+        """
+        fire = np.zeros((environment.height + 4, environment.width + 4), dtype=bool)
+        if environment.fires:
+            xs, ys = np.array([(f.xPos, f.yPos) for f in environment.fires], dtype=int).T
+            fire[ys + 2, xs + 2] = True
+        cells = np.rint(positions).astype(int) + 2
+        near = np.zeros(len(positions), dtype=bool)
+        for dx, dy in PANIC_OFFSETS:
+            near |= fire[cells[:, 1] + dy, cells[:, 0] + dx]
+        return np.where(near, panic + 1, np.maximum(panic - 1, 0))
+
+    def _desired_direction(self, positions, field, fear, velocities, i, j):
+        """
+        Returns the unit vector every person wants to walk along.
+
+        Calm persons head for the center of the neighboring cell that is closest
+        to an exit; panicking persons partly follow their neighbors instead.
+        """
+        cells = np.rint(positions).astype(int)
+        values = np.stack([field[cells[:, 1] + dy + 1, cells[:, 0] + dx + 1] for dx, dy in NEIGHBORS], axis=1)
+        best = values.argmin(axis=1)
+        here = field[cells[:, 1] + 1, cells[:, 0] + 1]
+        target = np.where((values[np.arange(len(cells)), best] < here)[:, None], cells + NEIGHBORS[best], cells)
+        goal = _normalized(target - positions)
+
+        # herding: the mean walking direction of the neighbors
+        heading = _normalized(velocities)
+        shared = np.zeros_like(heading)
+        for axis in (0, 1):
+            shared[:, axis] = np.bincount(i, heading[j, axis], len(positions)) + \
+                np.bincount(j, heading[i, axis], len(positions))
+        weight = (self.herding * fear)[:, None]
+        return _normalized((1 - weight) * goal + weight * _normalized(shared))
+
+    def _agent_forces(self, positions, i, j):
+        """
+        Returns the repulsion between persons and the contact force each person feels.
+        """
+        offset = positions[i] - positions[j]
+        distance = np.maximum(np.hypot(*offset.T), 1e-9)
+        normal = offset / distance[:, None]
+        overlap = np.maximum(2 * self.radius - distance, 0)
+        contact = self.body_stiffness * overlap
+        magnitude = self.repulsion * np.exp((2 * self.radius - distance) / self.repulsion_range) + contact
+        force = np.zeros_like(positions)
+        for axis in (0, 1):
+            pair_force = magnitude * normal[:, axis]
+            force[:, axis] = np.bincount(i, pair_force, len(positions)) - np.bincount(j, pair_force, len(positions))
+        pressure = np.bincount(i, contact, len(positions)) + np.bincount(j, contact, len(positions))
+        return force, pressure
+
+    def _wall_forces(self, positions, blocked):
+        """
+        Returns the repulsion from the blocked cells around every person and the contact force they exert.
+        """
+        cells = np.rint(positions).astype(int)
+        force = np.zeros_like(positions)
+        pressure = np.zeros(len(positions))
+        for dx, dy in NEIGHBORS:
+            wall = blocked[cells[:, 1] + dy + 1, cells[:, 0] + dx + 1]
+            if not wall.any():
+                continue
+            center = cells[wall] + (dx, dy)
+            # nearest point of the blocked cell's square to the person
+            offset = positions[wall] - np.clip(positions[wall], center - 0.5, center + 0.5)
+            distance = np.maximum(np.hypot(*offset.T), 1e-9)
+            contact = self.body_stiffness * np.maximum(self.radius - distance, 0)
+            magnitude = self.wall_repulsion * np.exp((self.radius - distance) / self.wall_range) + contact
+            force[wall] += (magnitude / distance)[:, None] * offset
+            pressure[wall] += contact
+        return force, pressure
+
+    def _move(self, positions, velocities, dt, blocked):
+        """
+        Integrates the positions, keeping persons out of blocked cells.
+
+        A person whose cell caught fire may still move within it and out of it.
+        """
+        upper = (blocked.shape[1] - 3, blocked.shape[0] - 3)  # the last column and row of the grid
+        moved = np.clip(positions + velocities * dt, 0, upper)
+        cells = np.rint(moved).astype(int)
+        into_wall = blocked[cells[:, 1] + 1, cells[:, 0] + 1] & \
+            np.any(cells != np.rint(positions).astype(int), axis=1)
+        moved[into_wall] = positions[into_wall]
+        velocities[into_wall] = 0
+        return moved
+
+
+def _normalized(vectors):
+    """
+    Scales every row vector to unit length, leaving zero vectors unchanged.
+    """
+    length = np.hypot(*vectors.T)
+    return vectors / np.where(length > 0, length, 1)[:, None]
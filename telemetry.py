@@ -0,0 +1,300 @@
+import math
+import os
+import tempfile
+import numpy as np
+
+
+class RunningStats:
+    """
+    Keeps the running count, mean, variance, minimum and maximum of a metric
+    in constant memory (Welford's algorithm).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self._m2 = 0.0
+
+    def add(self, value):
+        """
+        Adds a new observation to the running statistics.
+
+        Args:
+            value (float): The observed value of the metric.
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def std(self):
+        """
+        Returns the sample standard deviation (0 for fewer than two observations).
+        """
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(self._m2 / (self.count - 1))
+
+    def ci_width(self, confidence=0.95):
+        """
+        Returns the full width of the Student-t confidence interval of the mean.
+
+        Args:
+            confidence (float): The confidence level of the interval.
+
+        Returns:
+            float: The interval width, or infinity for fewer than two observations.
+        """
+        if self.count < 2:
+            return float('inf')
+        t = student_t_quantile(confidence, self.count - 1)
+        return 2 * t * self.std / math.sqrt(self.count)
+
+
+def student_t_quantile(confidence, df):
+    """
+    Returns the two-sided quantile t of the Student-t distribution, P(|T| < t) = confidence.
+
+    The probability is evaluated exactly for an integer number of degrees of
+    freedom (Abramowitz and Stegun 26.7.3 and 26.7.4) and inverted by bisection.
+
+    Args:
+        confidence (float): The confidence level, between 0 and 1.
+        df (int): The number of degrees of freedom, at least 1.
+
+    Returns:
+        float: The quantile t.
+    """
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be between 0 and 1")
+    if df < 1:
+        raise ValueError("df must be at least 1")
+
+    def probability(t):
+        theta = math.atan(t / math.sqrt(df))
+        cos2 = math.cos(theta) ** 2
+        term = 1.0
+        if df % 2:
+            total = 0.0 if df == 1 else 1.0
+            for k in range(3, df - 1, 2):
+                term *= cos2 * (k - 1) / k
+                total += term
+                if term < 1e-17 * total:
+                    break
+            if df > 1:
+                total *= math.sin(theta) * math.cos(theta)
+            return 2 / math.pi * (theta + total)
+        total = 1.0
+        for k in range(2, df - 1, 2):
+            term *= cos2 * (k - 1) / k
+            total += term
+            if term < 1e-17 * total:
+                break
+        return math.sin(theta) * total
+
+    low, high = 0.0, 1.0
+    while probability(high) < confidence:
+        low, high = high, 2 * high
+    for _ in range(100):
+        middle = (low + high) / 2
+        if probability(middle) < confidence:
+            low = middle
+        else:
+            high = middle
+        if high - low < 1e-12 * high:
+            break
+    return (low + high) / 2
+
+
+class Series:
+    """
+    A time series kept in a preallocated ring buffer of fixed capacity.
+
+    Values can be downsampled by keeping every k-th one (`every`) or by
+    reducing each window of k values to its (min, max, mean) (`window`).
+    Series of per-step counts keep the sum of the values since the last kept
+    one instead, so no counted event is lost. When the buffer is full the
+    oldest entries are overwritten, or, with a spill directory, the older half
+    is appended to a new `<spill_dir>/<name>-*.bin` file of this series as
+    float64 rows of (step, value...) first.
+
+    The series behaves like a read-only list of the retained values (the
+    window means when aggregating), so it can be indexed, iterated and plotted.
+    """
+
+    def __init__(self, name, capacity=10000, every=1, window=1, spill_dir=None, dtype=float, counts=False):
+        """
+        Initializes the Series object.
+
+        Args:
+            name (str): The name of the series, used for the spill file.
+            capacity (int): The number of entries kept in memory.
+            every (int): Keep every `every`-th value.
+            window (int): Reduce every `window` values to their (min, max, mean).
+            spill_dir (str): Directory to spill old entries to instead of dropping them.
+            dtype (type): The type of the stored values (float when aggregating windows).
+            counts (bool): The values are per-step counts, so every-k downsampling keeps
+                the sum of the values since the last kept one.
+        """
+        if every > 1 and window > 1:
+            raise ValueError("Use either every-k or window downsampling, not both")
+        self.name = name
+        self.capacity = capacity
+        self.every = every
+        self.window = window
+        self.counts = counts
+        self._pending = 0  # sum of the counts since the last kept one
+        self.width = 3 if window > 1 else 1
+        self._values = np.zeros((capacity, self.width), dtype=float if window > 1 else dtype)
+        self._steps = np.zeros(capacity, dtype=np.int64)
+        self._start = 0
+        self._size = 0
+        self.count = 0  # number of values appended so far
+        self._reset_window()
+        self.spill_path = None
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+            # a fresh file per series, so runs sharing the directory keep their spills
+            handle, self.spill_path = tempfile.mkstemp(prefix=f"{name}-", suffix=".bin", dir=spill_dir)
+            os.close(handle)
+
+    def _reset_window(self):
+        self._window_min = float('inf')
+        self._window_max = float('-inf')
+        self._window_sum = 0.0
+        self._window_count = 0
+
+    def append(self, value):
+        """
+        Adds the value of the next time step.
+
+        Args:
+            value (float): The observed value.
+        """
+        step = self.count
+        self.count += 1
+        if self.window > 1:
+            self._window_min = min(self._window_min, value)
+            self._window_max = max(self._window_max, value)
+            self._window_sum += value
+            self._window_count += 1
+            if self._window_count == self.window:
+                self._push((self._window_min, self._window_max, self._window_sum / self.window), step)
+                self._reset_window()
+        elif self.counts and self.every > 1:
+            self._pending += value
+            if step % self.every == 0:
+                self._push((self._pending,), step)
+                self._pending = 0
+        elif step % self.every == 0:
+            self._push((value,), step)
+
+    def _push(self, row, step):
+        """
+        Stores an entry, making room by spilling or overwriting the oldest ones.
+        """
+        if self._size == self.capacity:
+            if self.spill_path is not None:
+                self._spill(max(1, self.capacity // 2))
+            else:
+                self._start = (self._start + 1) % self.capacity
+                self._size -= 1
+        position = (self._start + self._size) % self.capacity
+        self._values[position] = row
+        self._steps[position] = step
+        self._size += 1
+
+    def _spill(self, count):
+        """
+        Appends the `count` oldest entries to the spill file and drops them from memory.
+        """
+        index = (self._start + np.arange(count)) % self.capacity
+        rows = np.column_stack((self._steps[index], self._values[index])).astype(np.float64)
+        with open(self.spill_path, "ab") as file:
+            file.write(rows.tobytes())
+        self._start = (self._start + count) % self.capacity
+        self._size -= count
+
+    def _ordered(self, array):
+        return array[(self._start + np.arange(self._size)) % self.capacity]
+
+    def values(self) -> np.ndarray:
+        """
+        Returns the retained values (window means when aggregating), oldest first.
+        """
+        return self._ordered(self._values)[:, -1]
+
+    def aggregates(self) -> np.ndarray:
+        """
+        Returns the retained (min, max, mean) rows of a windowed series, oldest first.
+        """
+        return self._ordered(self._values)
+
+    def steps(self) -> np.ndarray:
+        """
+        Returns the time step of every retained entry (the last step of its window).
+        """
+        return self._ordered(self._steps)
+
+    def spilled(self) -> np.ndarray:
+        """
+        Reads back the spilled entries as rows of (step, value...).
+        """
+        if self.spill_path is None or not os.path.exists(self.spill_path):
+            return np.empty((0, 1 + self.width))
+        return np.fromfile(self.spill_path, dtype=np.float64).reshape(-1, 1 + self.width)
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        return iter(self.values().tolist())
+
+    def __getitem__(self, index):
+        values = self.values()
+        return values[index].tolist()
+
+    def __array__(self, dtype=None, copy=None):
+        values = self.values()
+        return values if dtype is None else values.astype(dtype)
+
+
+class Telemetry:
+    """
+    Creates the bounded series of a simulation with a shared configuration.
+    """
+
+    def __init__(self, capacity=10000, every=1, window=1, spill_dir=None):
+        """
+        Initializes the Telemetry object.
+
+        Args:
+            capacity (int): The number of entries every series keeps in memory.
+            every (int): Keep every `every`-th value of every series.
+            window (int): Reduce every `window` values of every series to their (min, max, mean).
+            spill_dir (str): Directory to spill old entries to instead of dropping them.
+        """
+        self.capacity = capacity
+        self.every = every
+        self.window = window
+        self.spill_dir = spill_dir
+        self.streams = {}
+
+    def series(self, name, dtype=float, counts=False) -> Series:
+        """
+        Returns the series with the given name, creating it on first use.
+
+        Args:
+            name (str): The name of the series.
+            dtype (type): The type of the stored values.
+            counts (bool): The values are per-step counts that downsampling sums up.
+        """
+        if name not in self.streams:
+            self.streams[name] = Series(name, self.capacity, self.every, self.window, self.spill_dir, dtype,
+                                        counts)
+        return self.streams[name]
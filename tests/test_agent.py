@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from agent import Agents
+from environment import Environment
+from simulation import Simulation
+
+
+def layout(width=12, height=10):
+    environment = Environment(width, height, np.random.default_rng(0))
+    for x in range(width - 1):
+        environment.add_obstacle(x, 4)
+    environment.add_exit(0, 0)
+    environment.add_exit(width - 1, height - 1)
+    return environment
+
+
+def test_persons_and_fires_get_distinct_free_cells():
+    for seed in range(5):
+        simulation = Simulation(15, 12, 100, 10, 40, [(0, 0), (14, 11)], verbose=False, seed=seed)
+        environment = simulation.agents.environment
+        persons = {p.cell() for p in simulation.agents.persons}
+        fires = {(f.xPos, f.yPos) for f in simulation.agents.fires}
+        assert len(persons) == 100 and len(fires) == 10
+        assert not persons & fires
+        for cells in (persons, fires):
+            assert not cells & environment.obstacles
+            assert not cells & set(environment.exits)
+
+
+def test_zero_weight_zones_stay_empty():
+    environment = layout()
+    density = Agents.zone_density(environment, [(0, 0, 11, 3, 0.0), (0, 5, 5, 9, 1.0), (6, 5, 11, 9, 3.0)])
+    agents = Agents(environment, 25, 0, np.random.default_rng(2), density)
+    cells = np.array([p.cell() for p in agents.persons])
+    assert len({tuple(c) for c in cells.tolist()}) == 25
+    assert np.all(density[cells[:, 1], cells[:, 0]] > 0)
+
+
+def test_too_few_free_cells_raise():
+    environment = layout()
+    free = int(environment.free_cells().sum())
+    with pytest.raises(ValueError):
+        Agents(environment, free + 1, 0, np.random.default_rng(0))
+    with pytest.raises(ValueError):
+        Agents(layout(), free - 2, 3, np.random.default_rng(0))
+    density = Agents.zone_density(environment, [(0, 0, 1, 1, 1.0)])
+    with pytest.raises(ValueError):
+        Agents(layout(), 4, 0, np.random.default_rng(0), density)
@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+from agent import Agents
+from domain import TiledEvacuationModel
+from environment import Environment
+from simulation import Simulation
+
+
+def scenario(seed=3, width=40, height=30, persons=150, fires=4, obstacles=60):
+    rng = np.random.default_rng(seed)
+    environment = Environment(width, height, rng)
+    environment.add_exit(0, 0)
+    environment.add_exit(width - 1, height - 1)
+    cells = rng.choice(width * height, size=persons + fires + obstacles, replace=False)
+    cells = [(int(c % width), int(c // width)) for c in cells]
+    cells = [c for c in cells if c not in environment.exits]
+    obstacle_cells = cells[:obstacles]
+    for cell in obstacle_cells:
+        environment.add_obstacle(*cell)
+    return (environment.obstacle_mask(), environment.exit_field(), environment.exits,
+            cells[obstacles:obstacles + persons], cells[obstacles + persons:obstacles + persons + fires])
+
+
+def run(tiles, steps, processes):
+    with TiledEvacuationModel(*scenario(), tiles=tiles, seed=7) as simulation:
+        if processes:
+            simulation.run(steps)
+        else:
+            for _ in range(steps):
+                simulation.step()
+        return (simulation.agents.copy(), simulation.fires.copy(),
+                simulation.num_escaped, simulation.num_dead)
+
+
+@pytest.mark.parametrize("tiles, processes", [((3, 2), False), ((2, 2), True), ((1, 3), True)])
+def test_result_does_not_depend_on_tiling(tiles, processes):
+    agents, fires, escaped, dead = run((1, 1), 40, processes=False)
+    tiled_agents, tiled_fires, tiled_escaped, tiled_dead = run(tiles, 40, processes)
+    np.testing.assert_array_equal(tiled_agents, agents)
+    np.testing.assert_array_equal(tiled_fires, fires)
+    assert (tiled_escaped, tiled_dead) == (escaped, dead)
+
+
+def test_only_initial_fires_spread():
+    simulation = TiledEvacuationModel(*scenario(), tiles=(1, 1), seed=7)
+    try:
+        initial = int(simulation.fires.sum())
+        for _ in range(10):
+            before = int(simulation.fires.sum())
+            simulation.step()
+            assert int(simulation.fires.sum()) - before <= initial
+    finally:
+        simulation.close()
+
+
+def test_fire_does_not_spread_onto_exits_or_persons():
+    # the fire at (2, 2) is walled in except for an exit and a person who cannot move
+    environment = Environment(6, 5)
+    environment.add_exit(1, 2)
+    for cell in [(1, 1), (2, 1), (3, 1), (1, 3), (2, 3), (3, 3), (4, 1), (4, 2), (4, 3)]:
+        environment.add_obstacle(*cell)
+    with TiledEvacuationModel(environment.obstacle_mask(), environment.exit_field(), environment.exits,
+                                    [(3, 2)], [(2, 2)], tiles=(1, 1), seed=1) as simulation:
+        for _ in range(30):
+            simulation.step()
+            assert int(simulation.fires.sum()) == 1
+        assert simulation.remaining == 1
+
+
+def test_distance_field_goes_around_the_spreading_fire():
+    with TiledEvacuationModel(*scenario(), tiles=(2, 2), seed=7) as model:
+        model.run(15)
+        blocked, _, exits, _, _ = scenario()
+        environment = Environment(model.width, model.height)
+        for x, y in exits:
+            environment.add_exit(x, y)
+        ys, xs = np.nonzero(blocked | model.fires)
+        environment.block(list(zip(xs.tolist(), ys.tolist())))
+        np.testing.assert_array_equal(model.arrays["field"][model._inner], environment.exit_field())
+
+
+def simulation_with(width, height, exits, obstacles, persons, fires):
+    simulation = Simulation(width, height, 0, 0, 0, exits, verbose=False, obstacle_positions=obstacles, seed=0)
+    environment = simulation.agents.environment
+    simulation.agents.persons = [Agents.Person(x, y, environment) for x, y in persons]
+    environment.add_persons(simulation.agents.persons)
+    simulation.agents.fires = [Agents.Fire(x, y, environment) for x, y in fires]
+    environment.add_fires(simulation.agents.fires)
+    return simulation
+
+
+def test_isolated_calm_persons_escape_as_in_simulation():
+    # the persons walk a row, a column and a diagonal to the exit, so their paths never meet
+    simulation = simulation_with(20, 20, [(0, 0)], [(5, 3), (3, 5)], [(10, 0), (0, 12), (9, 9)], [])
+    with TiledEvacuationModel.from_environment(simulation.agents.environment, tiles=(2, 2)) as model:
+        for _ in range(14):
+            simulation.step()
+            model.step()
+            assert model.num_escaped == simulation.num_escaped
+    assert simulation.escape_times.count == 3
+
+
+def test_fire_damage_matches_simulation():
+    # a person walled in next to one fire and within distance 5 of another
+    walls = [(1, 1), (2, 1), (3, 1), (1, 3), (2, 3), (3, 3), (4, 1), (4, 2), (4, 3)]
+    simulation = simulation_with(9, 5, [(1, 2)], walls, [(3, 2)], [(2, 2), (7, 2)])
+    person = simulation.agents.persons[0]
+    with TiledEvacuationModel.from_environment(simulation.agents.environment, tiles=(1, 2)) as model:
+        for _ in range(20):
+            simulation.step()
+            model.step()
+            assert model.health[2, 3] == person.health
+    assert person.health == 50 - 20 * 1.5
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from agent import Agents
+from environment import Environment
+from simulation import Simulation
+
+
+def test_repaired_fields_equal_full_search():
+    rng = np.random.default_rng(0)
+    for _ in range(10):
+        width, height = rng.integers(5, 30, 2).tolist()
+        environment = Environment(width, height, rng)
+        for _ in range(int(rng.integers(0, width * height // 5))):
+            environment.add_obstacle(int(rng.integers(width)), int(rng.integers(height)))
+        for _ in range(3):
+            environment.add_exit(int(rng.integers(width)), int(rng.integers(height)))
+        environment.exit_field()
+        for _ in range(10):
+            cells = [(int(rng.integers(width)), int(rng.integers(height))) for _ in range(int(rng.integers(1, 5)))]
+            environment.block([cell for cell in cells if cell not in environment.exits])
+            fields = [environment._breadth_first_distances(exit) for exit in environment.exits]
+            for exit, field in zip(environment.exits, fields):
+                np.testing.assert_array_equal(environment.distance_fields[exit], field)
+            np.testing.assert_array_equal(environment.exit_field(), np.min(fields, axis=0))
+
+
+def test_person_walks_around_fire_towards_exit():
+    environment = Environment(10, 10)
+    environment.add_exit(0, 5)
+    for y in range(2, 9):
+        environment.add_fire(Agents.Fire(3, y, environment))
+    person = Agents.Person(6, 5, environment)
+    visited = []
+    for _ in range(12):
+        person.move_towards((0, 5))
+        visited.append(person.cell())
+    assert not any(environment.is_fire(x, y) for x, y in visited)
+    assert visited[-1] == (0, 5)
+
+
+def test_person_does_not_step_into_fire_when_following_others():
+    environment = Environment(5, 5)
+    environment.add_fire(Agents.Fire(2, 2, environment))
+    person = Agents.Person(1, 1, environment)
+    assert not person.can_move(1, 1)
+    person.move_towards(Agents.Person(4, 4, environment))
+    assert person.cell() == (1, 1)
+
+
+@pytest.mark.parametrize("movement", ["grid", "social_force"])
+def test_no_person_stands_on_a_burning_cell(movement):
+    for seed in range(3):
+        simulation = Simulation(30, 30, 100, 3, 30, [(0, 0), (29, 29)], verbose=False, seed=seed,
+                                movement=movement)
+        for _ in range(40):
+            simulation.step()
+            blocked = simulation.agents.environment.blocked
+            assert not any(blocked[y, x] for x, y in (p.cell() for p in simulation.agents.persons))
@@ -0,0 +1,64 @@
+import time
+
+import numpy as np
+
+from environment import Environment
+from evacuation_flow import estimate_evacuation, exit_opening_lower_bound, layout_distances
+from simulation import Simulation
+
+
+def test_default_estimate_bounds_simulation():
+    for seed in range(10):
+        simulation = Simulation(20, 20, 30, 0, 10, [(0, 0), (19, 19)], verbose=False, seed=seed)
+        estimate = estimate_evacuation(simulation.agents.environment)
+        for _ in range(200):
+            simulation.step()
+            if simulation.time_to_clear is not None:
+                break
+        if simulation.time_to_clear is not None:
+            assert estimate["clearance_time"] <= simulation.time_to_clear
+
+
+def test_single_person_exit_queues_the_crowd():
+    environment = Environment(10, 10)
+    environment.add_exit(0, 0)
+    positions = [(1, 1), (2, 2), (1, 2), (2, 1)]
+    unlimited = estimate_evacuation(environment, positions)
+    limited = estimate_evacuation(environment, positions, cell_capacity=1, exit_capacity=1)
+    assert unlimited["clearance_time"] == 2
+    assert limited["clearance_time"] == 4  # the first leaves after 1 step, then one per step
+    assert limited["exit_loads"] == [4]
+
+
+def test_exit_opening_lower_bound():
+    assert exit_opening_lower_bound([6, 2, 2], [1, 1, 1], 1000) == 336
+    assert exit_opening_lower_bound([None], [1], 3) == float("inf")
+
+
+def test_layout_distances_match_breadth_first_search():
+    rng = np.random.default_rng(0)
+    environment = Environment(15, 12, rng)
+    environment.add_exit(0, 0)
+    environment.add_exit(14, 6)
+    for cell in rng.choice(15 * 12, size=40, replace=False).tolist():
+        x, y = cell % 15, cell // 15
+        if (x, y) not in environment.exits:
+            environment.add_obstacle(x, y)
+    distances, nearest = layout_distances(environment.obstacle_mask(), environment.exits)
+    np.testing.assert_array_equal(distances, environment.exit_field())
+    fields = np.stack([environment.distance_field(exit) for exit in environment.exits])
+    reachable = np.isfinite(distances)
+    np.testing.assert_array_equal(nearest[reachable], fields.argmin(axis=0)[reachable])
+
+
+def test_capacity_estimate_of_a_large_crowd_takes_well_under_a_second():
+    simulation = Simulation(100, 100, 1000, 3, 300, [(0, 0), (99, 99), (0, 50)], verbose=False, seed=1)
+    elapsed = []
+    for _ in range(2):
+        start = time.perf_counter()
+        estimate = estimate_evacuation(simulation.agents.environment, cell_capacity=1, exit_capacity=1)
+        elapsed.append(time.perf_counter() - start)
+    # three single-person exits let out 1000 persons in no fewer than 334 steps
+    assert estimate["clearance_time"] >= 334
+    assert sum(estimate["exit_loads"]) == 1000
+    assert min(elapsed) < 1.0
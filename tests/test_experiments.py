@@ -0,0 +1,25 @@
+import pytest
+
+from experiments import run_until_converged
+from telemetry import RunningStats, student_t_quantile
+
+
+@pytest.mark.parametrize("df, expected", [(1, 12.7062), (4, 2.7764), (9, 2.2622), (29, 2.0452)])
+def test_student_t_quantile_matches_table(df, expected):
+    assert student_t_quantile(0.95, df) == pytest.approx(expected, abs=1e-4)
+
+
+def test_ci_width_uses_student_t():
+    stats = RunningStats()
+    for value in (1.0, 2.0, 3.0):
+        stats.add(value)
+    assert stats.ci_width(0.95) == pytest.approx(2 * 4.3027 * 1.0 / 3 ** 0.5, abs=1e-3)
+
+
+def test_capped_time_to_clear_does_not_converge():
+    params = dict(env_width=30, env_height=30, num_people=40, num_fires=0, num_obstacles=0,
+                  exit_positions=[(0, 0)])
+    result = run_until_converged(params, 3, metric="time_to_clear", ci_width=100.0,
+                                 min_replicas=2, max_replicas=4, seed=1)
+    assert result["capped"] == result["replicas"] == 4
+    assert not result["converged"]
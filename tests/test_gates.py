@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from environment import Environment
+from gates import Gate
+from telemetry import Telemetry
+
+
+def test_duplicate_gate_names_are_rejected():
+    environment = Environment(10, 10)
+    environment.add_gate("door", (5, 0), (5, 3))
+    with pytest.raises(ValueError):
+        environment.add_gate("door", (0, 5), (3, 5))
+    assert len(environment.gates) == 1
+
+
+def crossed(gate, *path):
+    path = np.array(path, dtype=float)
+    return [int(gate.crossings(before[None], after[None])[0]) for before, after in zip(path[:-1], path[1:])]
+
+
+def test_crossing_direction_sign():
+    gate = Gate("door", (5, 0), (5, 4))
+    # the left-hand side of the gate, seen from (5, 0) looking at (5, 4), is x < 5
+    assert crossed(gate, (7, 2), (3, 2)) == [1]
+    assert crossed(gate, (3, 2), (7, 2)) == [-1]
+    assert crossed(Gate("reversed", (5, 4), (5, 0)), (7, 2), (3, 2)) == [-1]
+    assert crossed(gate, (7, 1), (6, 3)) == [0]
+
+
+def test_moves_past_the_ends_are_not_counted():
+    gate = Gate("door", (5, 0), (5, 4))
+    assert crossed(gate, (7, 6), (3, 6)) == [0]
+    assert crossed(gate, (7, -1), (3, -2)) == [0]
+    assert crossed(gate, (7, 5), (3, 3)) == [1]  # enters the segment diagonally
+
+
+def test_stopping_on_the_line_counts_once():
+    gate = Gate("door", (5, 0), (5, 4))
+    assert sum(crossed(gate, (7, 2), (5, 2), (3, 2))) == 1
+    assert sum(crossed(gate, (7, 2), (5, 2), (5, 2), (5, 3), (3, 3))) == 1
+    assert crossed(gate, (7, 2), (5, 2), (7, 2)) == [1, -1]
+
+
+def test_fundamental_diagram_with_every_k_downsampling():
+    previous = np.array([[6.0, 1.0], [6.0, 3.0], [8.0, 2.0]])
+    current = np.array([[4.0, 1.0], [4.0, 3.0], [8.0, 2.0]])
+    full = Gate("door", (5, 0), (5, 4))
+    sampled = Gate("door", (5, 0), (5, 4), telemetry=Telemetry(every=3))
+    for _ in range(10):
+        full.record(previous, current)
+        sampled.record(previous, current)
+    assert len(sampled.forward) == 4  # steps 0, 3, 6 and 9
+    np.testing.assert_array_equal(sampled.flow(), [2, 6, 6, 6])
+    assert sampled.flow().sum() == full.flow().sum() == 20
+    # two crossings per step through a gate of length 4
+    np.testing.assert_allclose(sampled.fundamental_diagram()["specific_flow"], 0.5)
+    np.testing.assert_allclose(full.fundamental_diagram()["specific_flow"], 0.5)
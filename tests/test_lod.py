@@ -0,0 +1,40 @@
+import numpy as np
+
+from lod import LevelOfDetail
+from simulation import Simulation
+
+PARAMS = dict(env_width=40, env_height=30, num_people=120, num_fires=3, num_obstacles=40,
+              exit_positions=[(0, 0), (39, 29)])
+
+
+def test_quiet_persons_are_far_from_fires_exits_and_crowds():
+    level = LevelOfDetail(fire_radius=5, exit_radius=3, crowd_radius=2, crowd_size=5, interval=8)
+    simulation = Simulation(**PARAMS, verbose=False, seed=4, level_of_detail=level)
+    environment = simulation.agents.environment
+    checker = LevelOfDetail(level.fire_radius, level.exit_radius, level.crowd_radius, level.crowd_size, level.interval)
+    quiet_seen = 0
+    for _ in range(30):
+        persons = simulation.agents.persons
+        quiet = checker.quiet(persons, environment, simulation.timestep)
+        cells = np.array([p.cell() for p in persons]).reshape(-1, 2)
+        fires = np.array([(f.xPos, f.yPos) for f in environment.fires]).reshape(-1, 2)
+        for (x, y) in cells[quiet]:
+            assert np.all(np.hypot(fires[:, 0] - x, fires[:, 1] - y) >= level.fire_radius)
+            assert environment.exit_field()[y, x] > level.exit_radius
+            others = np.all(np.abs(cells - (x, y)) <= level.crowd_radius, axis=1).sum() - 1
+            assert others <= level.crowd_size
+        quiet_seen += int(quiet.sum())
+        simulation.step()
+    assert quiet_seen > 100
+
+
+def test_interval_one_reproduces_the_full_model():
+    full = Simulation(**PARAMS, verbose=False, seed=9)
+    level = LevelOfDetail(interval=1)
+    detailed = Simulation(**PARAMS, verbose=False, seed=9, level_of_detail=level)
+    for _ in range(40):
+        full.step()
+        detailed.step()
+        np.testing.assert_array_equal(detailed.agents.positions(), full.agents.positions())
+        assert (detailed.num_escaped, detailed.num_dead) == (full.num_escaped, full.num_dead)
+    assert level.quiet_updates == 0
@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+from service import JobService
+
+PARAMS = {"env_width": 20, "env_height": 20, "num_people": 10, "num_fires": 1, "num_obstacles": 5,
+          "exit_positions": [[0, 0]]}
+
+
+async def request(socket_path, method, path, payload=None):
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    # every response ends by closing the connection
+    response = await asyncio.wait_for(reader.read(), timeout=30)
+    writer.close()
+    head, _, content = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), content
+
+
+async def wait_for(condition, timeout=30):
+    for _ in range(int(timeout / 0.05)):
+        if condition():
+            return
+        await asyncio.sleep(0.05)
+    raise TimeoutError
+
+
+def run_against_service(scenario, tmp_path):
+    socket_path = str(tmp_path / "service.sock")
+    service = JobService(workers=2, retain=10)
+
+    async def main():
+        server = asyncio.create_task(service.serve(socket_path=socket_path))
+        await wait_for(lambda: (tmp_path / "service.sock").exists())
+        try:
+            await scenario(socket_path, service)
+        finally:
+            server.cancel()
+            await asyncio.gather(server, return_exceptions=True)
+
+    try:
+        asyncio.run(main())
+    finally:
+        service.shutdown()
+
+
+def test_routes_stream_and_cancel(tmp_path):
+    async def scenario(socket_path, service):
+        status, content = await request(socket_path, "POST", "/jobs", {"params": PARAMS, "timeStep": 20})
+        assert status == 201
+        job = json.loads(content)["id"]
+
+        # the stream of a job ends with its final state, while another job starts a new worker
+        stream = asyncio.create_task(request(socket_path, "GET", f"/jobs/{job}/events"))
+        long_params = dict(PARAMS, env_width=60, env_height=60, num_people=200)
+        status, content = await request(socket_path, "POST", "/jobs", {"params": long_params, "timeStep": 100000})
+        assert status == 201
+        long_job = json.loads(content)["id"]
+        status, content = await stream
+        assert status == 200
+        lines = [json.loads(line) for line in content.splitlines()]
+        assert lines[-1]["id"] == job and lines[-1]["status"] == "done"
+        assert all(line["job"] == job for line in lines[:-1])
+
+        await wait_for(lambda: service.jobs[long_job].status == "running")
+        status, _ = await request(socket_path, "DELETE", f"/jobs/{long_job}")
+        assert status == 200
+        await wait_for(lambda: service.jobs[long_job].status == "cancelled")
+        assert service.jobs[long_job].result["cancelled"]
+
+        status, content = await request(socket_path, "GET", "/jobs")
+        assert status == 200 and [job["id"] for job in json.loads(content)] == [job, long_job]
+        assert (await request(socket_path, "GET", "/jobs/99"))[0] == 404
+        assert (await request(socket_path, "POST", "/jobs", {"params": PARAMS}))[0] == 400
+        assert (await request(socket_path, "PUT", f"/jobs/{job}"))[0] == 405
+
+    run_against_service(scenario, tmp_path)
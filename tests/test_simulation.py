@@ -0,0 +1,28 @@
+import numpy as np
+
+from simulation import Simulation
+
+PARAMS = dict(env_width=30, env_height=20, num_people=80, num_fires=3, num_obstacles=30,
+              exit_positions=[(0, 0), (29, 19)])
+
+
+def trajectory(seed, steps=25, **params):
+    simulation = Simulation(**PARAMS, **params, verbose=False, seed=seed)
+    states = []
+    for _ in range(steps):
+        simulation.step()
+        states.append((simulation.agents.positions(), [(f.xPos, f.yPos) for f in simulation.agents.environment.fires],
+                       simulation.num_escaped, simulation.num_dead))
+    return states
+
+
+def test_same_seed_gives_identical_trajectories():
+    for params in ({}, {"movement": "social_force"}):
+        first, second = trajectory(11, **params), trajectory(11, **params)
+        for (positions, fires, escaped, dead), (positions2, fires2, escaped2, dead2) in zip(first, second):
+            np.testing.assert_array_equal(positions, positions2)
+            assert (fires, escaped, dead) == (fires2, escaped2, dead2)
+
+
+def test_different_seeds_give_different_trajectories():
+    assert not np.array_equal(trajectory(1, steps=1)[0][0], trajectory(2, steps=1)[0][0])
@@ -0,0 +1,45 @@
+import numpy as np
+
+from simulation import Simulation
+from social_force import neighbor_pairs
+
+WALL = [(10, y) for y in range(0, 16) if y not in (7, 8)]
+
+
+def crowd(seed, people=60, fires=2):
+    return Simulation(20, 16, people, fires, 0, [(0, 8), (19, 0)], verbose=False, obstacle_positions=WALL,
+                      seed=seed, movement="social_force")
+
+
+def test_persons_never_share_a_point_or_enter_a_blocked_cell():
+    for seed in range(3):
+        simulation = crowd(seed)
+        environment = simulation.agents.environment
+        for _ in range(30):
+            simulation.step()
+            positions = simulation.agents.positions()
+            distance = np.hypot(*(positions[:, None] - positions[None]).transpose(2, 0, 1))
+            np.fill_diagonal(distance, np.inf)
+            assert distance.min(initial=np.inf) > 0.05
+            cells = np.rint(positions).astype(int)
+            assert not environment.blocked[cells[:, 1], cells[:, 0]].any()
+
+
+def test_persons_reach_the_exit():
+    simulation = crowd(seed=5, people=20, fires=0)
+    for _ in range(40):
+        simulation.step()
+    assert simulation.num_escaped == 20
+
+
+def test_neighbor_pairs_equal_brute_force():
+    rng = np.random.default_rng(1)
+    for cutoff in (0.5, 2.0, 7.0):
+        # a dense cluster, a sparse spread and negative coordinates
+        positions = np.concatenate([rng.normal(0, 1, (80, 2)), rng.uniform(-30, 30, (120, 2))])
+        i, j = neighbor_pairs(positions, cutoff)
+        distance = np.hypot(*(positions[:, None] - positions[None]).transpose(2, 0, 1))
+        expected = set(zip(*np.nonzero(np.triu(distance < cutoff, k=1))))
+        assert len(i) == len(expected)
+        assert set(zip(i.tolist(), j.tolist())) == {(int(a), int(b)) for a, b in expected}
+    assert len(neighbor_pairs(np.zeros((1, 2)), 1.0)[0]) == 0
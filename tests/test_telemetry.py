@@ -0,0 +1,26 @@
+import numpy as np
+
+from telemetry import Series, Telemetry
+
+
+def test_count_series_sum_over_skipped_steps():
+    counts = Series("crossings", every=4, dtype=int, counts=True)
+    levels = Series("level", every=4, dtype=int)
+    for step in range(13):
+        counts.append(1)
+        levels.append(step)
+    assert list(counts) == [1, 4, 4, 4]
+    assert list(levels) == [0, 4, 8, 12]
+
+
+def test_spill_files_are_not_shared_between_runs(tmp_path):
+    first = Telemetry(capacity=4, spill_dir=tmp_path).series("escaped_counts", int)
+    for step in range(8):
+        first.append(step)
+    spilled = first.spilled()
+    second = Telemetry(capacity=4, spill_dir=tmp_path).series("escaped_counts", int)
+    for step in range(8):
+        second.append(step)
+    assert first.spill_path != second.spill_path
+    np.testing.assert_array_equal(first.spilled(), spilled)
+    assert spilled.shape == (4, 2)
@@ -0,0 +1,99 @@
+import numpy as np
+import matplotlib.pyplot as plt
+
+
+def plot_environment(environment, agents):
+    """
+    Plots the environment grid with agents and objects.
+
+    Args:
+        environment (Environment): The environment to be plotted.
+        agents (Agents): The Agents object containing the agents and objects to be plotted.
+    """
+    fig, ax = plt.subplots()
+
+    for exit in environment.exits:
+        ax.scatter(*exit, color='green', label='Exit')
+
+    for obstacle in environment.obstacles:
+        ax.scatter(*obstacle, color='black', label='Obstacle')
+
+    for person in agents.persons:
+        ax.scatter(person.xPos, person.yPos, color='blue', label='Person')
+
+    for fire in agents.fires:
+        ax.scatter(fire.xPos, fire.yPos, color='red', label='Fire')
+
+    ax.set_xticks(np.arange(0, environment.width, 1))
+    ax.set_yticks(np.arange(0, environment.height, 1))
+    ax.grid(True)
+    handles, labels = ax.get_legend_handles_labels()
+    by_label = dict(zip(labels, handles))
+    plt.legend(by_label.values(), by_label.keys())
+    plt.show()
+
+
+def plot_bottleneck_areas(simulation_list):
+    """
+    Plots the number of bottleneck areas at each time step of every simulation.
+
+    Args:
+        simulation_list (list): The Simulation objects to be plotted.
+    """
+    plt.figure(figsize=(10, 6))
+    for simulation in simulation_list:
+        # Get the count of bottleneck areas at each timestep
+        bottleneck_counts = simulation.bottleneck_areas  # directly use the numbers
+        time_steps = range(1, len(bottleneck_counts) + 1)
+        plt.plot(time_steps, bottleneck_counts, marker='o', label=f"Simulation with {simulation.total_person} persons")
+        plt.xlabel('Time step')
+        plt.ylabel('Number of bottlenecks')
+        plt.title('Bottleneck Areas over Time')
+        plt.legend()
+    plt.show()
+
+
+def save_experiment_figures(name, variants, directory):
+    """
+    Saves the figures of a batch experiment as PNG files, without opening any window.
+
+    Args:
+        name (str): The name of the experiment, used as the file name prefix.
+        variants (list): The summaries of the experiment's variants, each with a
+            `label`, per-step `series` means and per-metric `metrics` statistics.
+        directory (str): The directory the figures are written to.
+
+    Returns:
+        list: The paths of the written figures.
+    """
+    paths = []
+    for series, ylabel in (("num_escaped", "Number of escaped people"),
+                           ("num_dead", "Number of dead people"),
+                           ("bottleneck_areas", "Number of bottlenecks")):
+        fig, ax = plt.subplots(figsize=(10, 6))
+        for variant in variants:
+            values = variant["series"][series]
+            ax.plot(range(1, len(values) + 1), values, label=variant["label"])
+        ax.set_xlabel('Time step (seconds)')
+        ax.set_ylabel(ylabel)
+        ax.set_title(f'{name}: mean {ylabel.lower()} over time')
+        ax.legend()
+        paths.append(f"{directory}/{name}_{series}.png")
+        fig.savefig(paths[-1])
+        plt.close(fig)
+
+    fig, ax = plt.subplots(figsize=(15, 6))
+    x = np.arange(len(variants))
+    ax.bar(x, [v["metrics"]["num_escaped"]["mean"] for v in variants], 0.35,
+           yerr=[v["metrics"]["num_escaped"]["std"] for v in variants], label='Average Escape Counts')
+    ax.set_xlabel('Variant')
+    ax.set_ylabel('Escape Counts')
+    ax.set_title(f'{name}: Average Escape Counts with Standard Deviation')
+    ax.set_xticks(x)
+    ax.set_xticklabels([v["label"] for v in variants], rotation='horizontal')
+    ax.legend()
+    fig.tight_layout()
+    paths.append(f"{directory}/{name}_escape_counts.png")
+    fig.savefig(paths[-1])
+    plt.close(fig)
+    return paths